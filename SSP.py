@@ -4,8 +4,84 @@
 SSP.py: a program to deliver required content for jupyter notebooks to compliment the solid-state course
 """
 
-######### Make default plot style #########
-import matplotlib
+######### Lazy loading of the heavy packages #########
+import os
+import sys
+import types
+import importlib
+import importlib.abc
+import importlib.util
+
+# The names exported by `from SSP import *`, which every notebook starts with
+__all__ = [
+    'np', 'const', 'pd', 'matplotlib', 'plt', 'animation', 'py', 'go', 'HTML', 'wikitables',
+    'curve_fit', 'integrate', 'find_peaks', 'setplotstyle', 'draw_classic_axes', 'TIERS', 'load_tier',
+    'R', 'hbar', 'kb', 'm_e', 'e', 'load_xy', 'ELEMENTS', 'ELEMENT_DTYPE', 'load_elements', 'element', 'element_table',
+]
+
+# A module proxy which only performs the import when one of its attributes is first used
+class _LazyModule(types.ModuleType):
+    # The docstring is an instance attribute of every module, so it is looked up through the real module
+    __doc__ = property(lambda self: self._load().__doc__)
+
+    def _load(self):
+        module = sys.modules.get(self.__name__) or importlib.import_module(self.__name__)
+        # Copy the namespace across so subsequent lookups never come back through here
+        self.__dict__.update(module.__dict__)
+        return module
+
+    def __getattr__(self, attr):
+        # Dunders such as __version__ and __file__ come from the real module too
+        module = self._load()
+        try:
+            return getattr(module, attr)
+        except AttributeError:
+            if attr.startswith('__'):
+                raise
+        # Allow e.g. matplotlib.ticker without an explicit import of the submodule
+        try:
+            return importlib.import_module(self.__name__ + '.' + attr)
+        except ModuleNotFoundError:
+            raise AttributeError(f"module '{self.__name__}' has no attribute '{attr}'") from None
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        return f"<lazy module '{self.__name__}'>"
+
+# A proxy for a single object (function or class) imported from a package
+class _LazyObject:
+    def __init__(self, module, name):
+        self._module = module
+        self._name = name
+        self._obj = None
+
+    def _load(self):
+        if self._obj is None:
+            self._obj = getattr(importlib.import_module(self._module), self._name)
+        return self._obj
+
+    def __call__(self, *args, **kwargs):
+        return self._load()(*args, **kwargs)
+
+    # A proxied class still works with isinstance, issubclass and as a base class, e.g. class Page(HTML)
+    def __instancecheck__(self, obj):
+        return isinstance(obj, self._load())
+
+    def __subclasscheck__(self, cls):
+        return issubclass(cls, self._load())
+
+    def __mro_entries__(self, bases):
+        return (self._load(),)
+
+    def __getattr__(self, attr):
+        if attr.startswith('_'):
+            raise AttributeError(attr)
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        return f"<lazy {self._module}.{self._name}>"
 
 # Define the default plot style through rcParams
 def setplotstyle():
@@ -39,18 +115,36 @@ def draw_classic_axes(ax, x=0, y=0, xlabeloffset=.1, ylabeloffset=.07):
                 ha='right', va='center')
 
 ######### Import packages #########
-import pandas as pd # panads for data manipulation
+# Only numpy and the physical constants are imported eagerly; everything else is imported on first use
 import numpy as np # numpy for all things mathematical/numerical
-import matplotlib.pyplot as plt # matplotlib.pyplot for plotting
-import matplotlib.animation as animation # matplotlib.animation for making animations
-import plotly.offline as py
-import plotly.graph_objs as go
-from IPython.display import HTML 
-import wikitables
 import scipy.constants as const # scipy.constants for physical constants
-from scipy.optimize import curve_fit # scipy.optimize for curve fitting
-import scipy.integrate as integrate #scipy.integrate for numerical integration
-from scipy.signal import find_peaks # scipy.signal for peak finding
+
+# The import tiers, in order of increasing cost
+TIERS = {
+    'core': ['numpy', 'scipy.constants'],
+    'scipy': ['scipy.optimize', 'scipy.integrate', 'scipy.signal'],
+    'plotting': ['matplotlib', 'matplotlib.pyplot', 'matplotlib.animation', 'plotly.offline', 'plotly.graph_objs'],
+    'notebook': ['pandas', 'IPython.display', 'wikitables'],
+}
+
+matplotlib = _LazyModule('matplotlib')
+pd = _LazyModule('pandas') # panads for data manipulation
+plt = _LazyModule('matplotlib.pyplot') # matplotlib.pyplot for plotting
+animation = _LazyModule('matplotlib.animation') # matplotlib.animation for making animations
+py = _LazyModule('plotly.offline')
+go = _LazyModule('plotly.graph_objs')
+HTML = _LazyObject('IPython.display', 'HTML')
+wikitables = _LazyModule('wikitables')
+curve_fit = _LazyObject('scipy.optimize', 'curve_fit') # scipy.optimize for curve fitting
+integrate = _LazyModule('scipy.integrate') #scipy.integrate for numerical integration
+find_peaks = _LazyObject('scipy.signal', 'find_peaks') # scipy.signal for peak finding
+
+# Import every package in the given tier (and those below it) up front
+def load_tier(tier):
+    names = list(TIERS)
+    for name in names[:names.index(tier)+1]:
+        for module in TIERS[name]:
+            importlib.import_module(module)
 
 ######### "Global variables" (not actually gloabl variables in the python sense) #########
 R = const.R
@@ -59,4 +153,83 @@ kb = const.k
 m_e = const.m_e
 e = const.e
 
-setplotstyle() # Set the plot style
\ No newline at end of file
+######### Data loading #########
+
+# Parsed data is cached next to its source as <filename>.npy with the same modification time as the
+# source, and is memory-mapped on later loads; a changed source (different mtime) is parsed again
+def _cached_parse(filename, parse, cache = True):
+    sidecar = filename + '.npy'
+    mtime = os.stat(filename).st_mtime_ns
+    if cache and os.path.exists(sidecar) and os.stat(sidecar).st_mtime_ns == mtime:
+        return np.load(sidecar, mmap_mode = 'r')
+
+    data = parse(filename)
+    if cache:
+        # Written to a temporary file given the source's mtime first, so that a concurrent reader never
+        # maps a partial sidecar
+        try:
+            tmp = f'{filename}.{os.getpid()}.tmp.npy'
+            np.save(tmp, data)
+            os.utime(tmp, ns = (mtime, mtime))
+            os.replace(tmp, sidecar)
+        except OSError:
+            pass # read-only location, so just return the parsed data
+    return data
+
+# Load a two-column whitespace-separated file (e.g. .x_y diffraction data) as an (N, 2) array
+def load_xy(filename, cache = True):
+    return _cached_parse(filename, lambda f: np.loadtxt(f, ndmin = 2), cache)
+
+# Element properties bundled with the course, one record per element: atomic number Z, symbol, name, molar heat
+# capacity at 25 C [J/(mol K)] (the CRC values of the Wikipedia data page) and linear thermal expansion
+# coefficient at 25 C [um/(m K)], nan where unknown. build_elements.py rebuilds the file from saved html pages.
+ELEMENTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'elements.csv')
+ELEMENT_DTYPE = [('Z', 'i8'), ('symbol', 'U2'), ('element', 'U16'), ('heat_capacity', 'f8'), ('expansion', 'f8')]
+
+# Load the element properties as a (memory-mapped) structured array, with no network access
+def load_elements(filename = ELEMENTS, cache = True):
+    parse = lambda f: np.genfromtxt(f, delimiter = ',', skip_header = 1, dtype = ELEMENT_DTYPE, encoding = 'utf-8')
+    return _cached_parse(filename, parse, cache)
+
+# The record of one element, by atomic number or symbol
+def element(key, filename = ELEMENTS):
+    table = load_elements(filename)
+    match = np.flatnonzero(table['symbol' if isinstance(key, str) else 'Z'] == key)
+    if match.size == 0:
+        raise KeyError(f"Unknown element {key!r}")
+    return table[match[0]]
+
+# The element properties as a DataFrame with the columns used in 1-1-specificheatI
+def element_table(filename = ELEMENTS):
+    table = load_elements(filename)
+    return pd.DataFrame({
+        'Atomic number' : table['Z'],
+        'Atomic symbol' : table['symbol'],
+        'Element' : table['element'],
+        'Specific heat' : table['heat_capacity'],
+        'Expansion' : table['expansion'],
+    })
+
+######### Plot style #########
+
+# Finds matplotlib for the import system and sets the default plot style once it has been executed, so the
+# style is in place however matplotlib is first imported (through plt, crystal.py or a plain import)
+class _StyleOnImport(importlib.abc.MetaPathFinder):
+    def find_spec(self, name, path, target=None):
+        if name != 'matplotlib':
+            return None
+        sys.meta_path.remove(self)
+        spec = importlib.util.find_spec(name)
+        if spec is not None and spec.loader is not None:
+            exec_module = spec.loader.exec_module
+            def exec_and_style(module):
+                exec_module(module)
+                setplotstyle()
+            spec.loader.exec_module = exec_and_style
+        return spec
+
+# Set the plot style straight away if matplotlib has already been imported elsewhere
+if 'matplotlib' in sys.modules:
+    setplotstyle()
+elif not any(isinstance(f, _StyleOnImport) for f in sys.meta_path):
+    sys.meta_path.insert(0, _StyleOnImport())
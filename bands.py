@@ -0,0 +1,283 @@
+#!/usr/bin/python
+
+"""
+bands.py: nearly-free-electron band structures from one batched diagonalisation over all k-points
+"""
+
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+
+from SSP import *
+
+CHUNK = 2**16 # number of k-points diagonalised in one eigvalsh call
+
+######### Nearly-free electron model #########
+
+def reciprocal_set(n = 1, dim = 1, b = 2*np.pi):
+
+    """
+    The reciprocal lattice vectors G of a simple (hyper)cubic lattice used as the plane-wave basis
+
+    Input:
+    ---
+    n: largest multiple of b along each axis, giving (2n+1)^dim vectors
+    dim: dimension
+    b: length of the primitive reciprocal lattice vector
+
+    Returns:
+    ---
+    An array of shape ((2n+1)^dim, dim)
+
+    """
+
+    m = np.arange(-n, n+1)
+    return b * np.array(list(itertools.product(m, repeat=dim)), dtype=float).reshape(-1, dim)
+
+def fold(k, b = 2*np.pi):
+    # Map each component of k into the first Brillouin zone [-b/2, b/2)
+    return (k + b/2) % b - b/2
+
+def nfe_hamiltonians(k, G, V = 1, V0 = 0):
+
+    """
+    Build the stacked nearly-free-electron Hamiltonians for every k-point
+
+    Input:
+    ---
+    k: k-points, array of shape (Nk, dim)
+    G: plane-wave basis, array of shape (M, dim) (see reciprocal_set)
+    V: Fourier component coupling every pair of plane waves; a scalar, an (M, M) array,
+       or a function of the differences G - G' (shape (M, M, dim)) returning an (M, M) array
+    V0: constant added to the diagonal
+
+    Returns:
+    ---
+    An array of shape (Nk, M, M)
+
+    """
+
+    M = len(G)
+    if callable(V):
+        coupling = np.asarray(V(G[:, None, :] - G[None, :, :]), dtype=float)
+    else:
+        coupling = np.broadcast_to(np.asarray(V, dtype=float), (M, M))
+    coupling = coupling * (1 - np.eye(M)) + V0 * np.eye(M)
+
+    # Kinetic energy |k + G|^2 = |k|^2 + 2 k.G + |G|^2 on the diagonal, the cross term as one matmul
+    H = np.empty((len(k), M, M))
+    H[:] = coupling
+    diagonal = np.einsum('nii->ni', H)
+    diagonal += (k**2).sum(-1)[:, None] + 2 * k @ G.T + (G**2).sum(-1)
+    return H
+
+def nfe_bands(k, V = 1, n = 1, dim = None, b = 2*np.pi, V0 = 0, nbands = None, reduce = True, chunk = CHUNK, workers = 1):
+
+    """
+    Band energies of the nearly-free-electron model for an arbitrary array of k-points
+
+    Input:
+    ---
+    k: k-points, array of shape (..., dim), or of any shape in 1D
+    V: Fourier component of the potential (see nfe_hamiltonians)
+    n: number of reciprocal lattice vectors along each axis on either side of zero
+    dim: dimension (inferred from k if None: 1 unless k has a trailing axis)
+    b: length of the primitive reciprocal lattice vector
+    V0: constant added to the diagonal
+    nbands: number of lowest bands returned (all if None)
+    reduce: True folds k into the first Brillouin zone before building the Hamiltonian
+    chunk: number of k-points diagonalised at a time
+    workers: number of threads diagonalising chunks concurrently (eigvalsh releases the GIL)
+
+    Returns:
+    ---
+    The energies, an array of shape (..., nbands)
+
+    """
+
+    k = np.asarray(k, dtype=float)
+    if dim is None:
+        dim = 1 if k.ndim < 2 else k.shape[-1]
+    if dim == 1 and (k.ndim == 0 or k.shape[-1] != 1):
+        k = k[..., None]
+    shape = k.shape[:-1]
+    k = k.reshape(-1, dim)
+    if reduce:
+        k = fold(k, b)
+
+    G = reciprocal_set(n, dim, b)
+    nbands = len(G) if nbands is None else nbands
+    out = np.empty((len(k), nbands))
+
+    def solve(start):
+        H = nfe_hamiltonians(k[start:start+chunk], G, V, V0)
+        out[start:start+chunk] = np.linalg.eigvalsh(H)[:, :nbands]
+
+    starts = range(0, len(k), chunk)
+    if workers == 1:
+        for start in starts:
+            solve(start)
+    else:
+        with ThreadPoolExecutor(workers) as pool:
+            list(pool.map(solve, starts))
+    return out.reshape(shape + (nbands,))
+
+def nfe_bands_2d(kx, ky, **kwargs):
+    # Bands on a 2D grid, broadcasting kx and ky as in 5-2-bands, returned band-first
+    kx, ky = np.broadcast_arrays(kx, ky)
+    energies = nfe_bands(np.stack([kx, ky], axis=-1), dim=2, **kwargs)
+    return np.moveaxis(energies, -1, 0)
+
+######### Tight-binding bands #########
+
+def graphene_bands(kx, ky, t = 4, a = 1):
+
+    """
+    Valence and conduction bands of the nearest-neighbour tight-binding model of graphene
+
+    Input:
+    ---
+    kx, ky: wavevector components (broadcastable arrays)
+    t: hopping
+    a: carbon-carbon distance
+
+    Returns:
+    ---
+    An array of shape (2, ...) holding the valence and the conduction band
+
+    """
+
+    f = 2 * np.cos(np.sqrt(3) * ky * a) + 4 * np.cos((3/2) * kx * a) * np.cos((np.sqrt(3)/2) * ky * a)
+    E = t * np.sqrt(np.maximum(3 + f, 0))
+    return np.stack([-E, E])
+
+######### Evaluation on large k-grids #########
+
+MEMORY = 2**28 # default budget [bytes] for the temporaries of a single tile
+TEMPORARIES = 8 # float64 temporaries per output value assumed when sizing tiles
+
+def evaluate_grid(func, kx, ky, nbands = 1, dtype = np.float32, filename = None, out = None,
+                  memory = MEMORY, workers = 1):
+
+    """
+    Evaluate a band function over the grid kx x ky tile by tile, writing into a preallocated array
+
+    Input:
+    ---
+    func: function of (KX, KY) arrays of one tile returning an array of shape (nbands, *KX.shape),
+          or of KX.shape if nbands is 1 (e.g. graphene_bands)
+    kx, ky: 1D arrays of the grid axes
+    nbands: number of bands returned by func
+    dtype: dtype of the output (float32 halves the storage)
+    filename: if given, the output is a numpy memory-mapped .npy file of this name
+    out: optional preallocated output of shape (nbands, len(ky), len(kx))
+    memory: budget [bytes] for the temporaries of one tile; each worker holds one tile
+    workers: number of threads evaluating tiles concurrently
+
+    Returns:
+    ---
+    The energies, of shape (nbands, len(ky), len(kx)), indexed like np.meshgrid(kx, ky)
+
+    """
+
+    kx = np.asarray(kx)
+    ky = np.asarray(ky)
+    shape = (nbands, len(ky), len(kx))
+    if out is None:
+        if filename is None:
+            out = np.empty(shape, dtype=dtype)
+        else:
+            out = np.lib.format.open_memmap(filename, mode='w+', dtype=dtype, shape=shape)
+
+    # Each tile is a band of complete rows sized to fit the memory budget
+    rows = max(1, int(memory // (len(kx) * nbands * 8 * TEMPORARIES)))
+
+    def tile(start):
+        KX, KY = np.meshgrid(kx, ky[start:start+rows])
+        out[:, start:start+rows] = np.reshape(func(KX, KY), (nbands,) + KX.shape)
+
+    starts = range(0, len(ky), rows)
+    if workers == 1:
+        for start in starts:
+            tile(start)
+    else:
+        with ThreadPoolExecutor(workers) as pool:
+            list(pool.map(tile, starts))
+
+    if isinstance(out, np.memmap):
+        out.flush()
+    return out
+
+######### Band filling #########
+
+def _check_filling(ff, states):
+    # Fewer than one electron would index the states from the top and return the highest energy
+    if np.any(ff > states):
+        raise ValueError(f"fillingfraction {np.max(ff):g} leaves no electron in {states:g} states")
+
+def fermi_level(energies, fillingfraction = 1, bins = None):
+
+    """
+    Highest occupied energy when a set of states is filled with electrons, for many fillings at once
+
+    Input:
+    ---
+    energies: array of the energies of all states (any shape, e.g. a band grid)
+    fillingfraction: ratio of states to electrons (>= 1, smaller values are taken as 1) and at most the
+                     number of states, so that one electron is placed; scalar or array
+    bins: None selects the exact levels with np.partition; an integer instead interpolates the
+          levels from a cumulative histogram with that many bins, and the output of
+          cumulative_states reuses a histogram computed once (e.g. for an interactive slider)
+
+    Returns:
+    ---
+    The Fermi level(s), with the shape of fillingfraction
+
+    """
+
+    ff = np.maximum(np.asarray(fillingfraction, dtype=float), 1) # the ratio must be greater than 1
+
+    if isinstance(bins, tuple):
+        cumulative, edges = bins
+        _check_filling(ff, cumulative[-1])
+        return np.interp(cumulative[-1] / ff, cumulative, edges)
+
+    flat = np.ravel(energies)
+    flat = flat[~np.isnan(flat)]
+    _check_filling(ff, flat.size)
+
+    if bins is None:
+        # A single partition places every requested order statistic
+        index = (flat.size / ff).astype(int) - 1
+        part = np.partition(flat, np.unique(index))
+        return part[index]
+
+    return fermi_level(None, ff, cumulative_states(flat, bins))
+
+def cumulative_states(energies, bins = 4096):
+    # Number of states below each bin edge, for fermi_level(..., bins=cumulative_states(...))
+    flat = np.ravel(energies)
+    counts, edges = np.histogram(flat[~np.isnan(flat)], bins)
+    return np.concatenate([[0], np.cumsum(counts)]), edges
+
+def occupied(energies, E_F):
+
+    """
+    Occupancy masks of the states for one or many Fermi levels
+
+    Input:
+    ---
+    energies: array of the energies of all states
+    E_F: Fermi level, scalar or 1D array
+
+    Returns:
+    ---
+    A boolean array of shape energies.shape, or (len(E_F), *energies.shape)
+
+    """
+
+    E_F = np.asarray(E_F)
+    return energies <= E_F.reshape(E_F.shape + (1,)*np.ndim(energies))
+
+def fill(energies, E_F):
+    # Copy of the band with the empty states set to nan, as plotted in Graphene.ipynb
+    return np.where(occupied(energies, E_F), energies, np.nan)
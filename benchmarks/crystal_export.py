@@ -0,0 +1,43 @@
+#!/usr/bin/python
+
+"""
+crystal_export.py: size and export time of every crystal.py figure as full and as compact html
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crystal import *
+
+def timed(f, *args, **kwargs):
+    start = time.perf_counter()
+    out = f(*args, **kwargs)
+    return time.perf_counter() - start, out
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'figure':<28}{'full [kB]':>11}{'compact [kB]':>14}{'full [s]':>10}{'compact [s]':>13}")
+        totals = np.zeros(2)
+        for filename, build in FIGURES.items():
+            fig = build()
+            row = []
+            for compact, folder in ((False, 'full'), (True, 'compact')):
+                os.makedirs(os.path.join(tmp, folder), exist_ok = True)
+                path = os.path.join(tmp, folder, filename)
+                seconds, _ = timed(export_html, fig, path, auto_open = False, compact = compact)
+                row.append((os.path.getsize(path) / 1e3, seconds))
+            totals += [row[0][0], row[1][0]]
+            print(f"{filename:<28}{row[0][0]:>11.1f}{row[1][0]:>14.1f}{row[0][1]:>10.3f}{row[1][1]:>13.3f}")
+
+        # The compact pages share one plotly.min.js, fetched (and cached by the browser) once
+        bundle = os.path.getsize(os.path.join(tmp, 'compact', 'plotly.min.js')) / 1e3
+        print(f"{'total':<28}{totals[0]:>11.1f}{totals[1]:>14.1f}")
+        print(f"shared plotly.min.js: {bundle:.1f} kB, compact total including it: {totals[1] + bundle:.1f} kB "
+              f"({totals[0] / (totals[1] + bundle):.1f}x smaller)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/python
+
+"""
+fermi_level.py: semiconductors.neutral_fermi_level against a root-find per point on the 6-1/6-2 energy grid
+"""
+
+import os
+import sys
+import time
+
+from scipy.optimize import brentq
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from semiconductors import *
+import semiconductors
+
+def timed(f, *args, **kwargs):
+    start = time.perf_counter()
+    out = f(*args, **kwargs)
+    return time.perf_counter() - start, out
+
+# The notebook approach: densities summed on a fine energy grid, one brentq per (T, doping)
+E = np.linspace(-6, 8, 20001)
+g_e = M_E * np.sqrt(np.maximum(E - E_C, 0))
+g_h = M_H * np.sqrt(np.maximum(E_V - E, 0))
+
+def charge(E_F, kT, N_D, N_A):
+    f = 1 / (np.exp(np.clip((E - E_F) / kT, -700, 700)) + 1)
+    n, p = np.trapezoid(g_e * f, E), np.trapezoid(g_h * (1 - f), E)
+    return n + N_A / (1 + np.exp((E_A - E_F) / kT)) - p - N_D / (1 + np.exp((E_F - E_D) / kT))
+
+def grid_fermi_level(kT, N_D, N_A):
+    return np.array([brentq(charge, -3, 5, args = (t, d, N_A)) for t, d in zip(kT.ravel(), N_D.ravel())])
+
+def main():
+    t_table = timed(semiconductors._table)[0]
+    kT, N_D = np.meshgrid(np.geomspace(0.05, 2, 100), np.geomspace(1e-6, 1, 100))
+    t_new, E_F = timed(neutral_fermi_level, kT, N_D, 1e-4)
+    sample = slice(None, None, 250)
+    t_old, reference = timed(grid_fermi_level, kT.ravel()[sample], N_D.ravel()[sample], 1e-4)
+    per_point = t_old / reference.size
+    print(f"F_1/2 table: {t_table:.3f} s (once per process)")
+    print(f"{kT.size} temperatures x dopings: {per_point * kT.size:.1f} s (extrapolated from {reference.size}) "
+          f"-> {t_new:.3f} s, max |dE_F| = {np.abs(E_F.ravel()[sample] - reference).max():.1e}")
+
+if __name__ == '__main__':
+    main()
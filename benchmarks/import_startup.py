@@ -0,0 +1,48 @@
+#!/usr/bin/python
+
+"""
+import_startup.py: cold-import time and resident memory of SSP for each import tier
+"""
+
+import os
+import sys
+import json
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Run in a fresh interpreter so every measurement is a cold import
+CHILD = """
+import sys, time, json, resource
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+import SSP
+SSP.load_tier({tier!r})
+elapsed = time.perf_counter() - start
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+if sys.platform == 'darwin':
+    rss /= 1024 # bytes on macOS, kilobytes elsewhere
+print(json.dumps(dict(time = elapsed, rss = rss)))
+"""
+
+def measure(tier, repeats = 3):
+    results = []
+    for _ in range(repeats):
+        out = subprocess.run([sys.executable, '-c', CHILD.format(root = ROOT, tier = tier)],
+                             capture_output = True, text = True, check = True)
+        results.append(json.loads(out.stdout))
+    # Report the best time (least noise) and the largest resident set
+    return min(r['time'] for r in results), max(r['rss'] for r in results)
+
+def main():
+    # The SSP module is imported here only to get the list of tiers
+    sys.path.insert(0, ROOT)
+    from SSP import TIERS
+
+    print(f"{'tier':<10} {'time [s]':>10} {'max RSS [MB]':>14}")
+    for tier in TIERS:
+        t, rss = measure(tier)
+        print(f"{tier:<10} {t:>10.3f} {rss/1024:>14.1f}")
+
+if __name__ == '__main__':
+    main()
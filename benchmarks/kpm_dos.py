@@ -0,0 +1,45 @@
+#!/usr/bin/python
+
+"""
+kpm_dos.py: kernel-polynomial DOS (tightbinding.kpm_dos) against exact diagonalisation of disordered chains
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tightbinding import *
+
+BINS = 30
+DENSE_MAX = 4000 # largest chain diagonalised as a dense matrix
+
+def timed(f, *args, **kwargs):
+    start = time.perf_counter()
+    out = f(*args, **kwargs)
+    return time.perf_counter() - start, out
+
+def binned(H, edges, samples = 64, **kwargs):
+    # States per bin from the KPM density, integrated with the trapezoid rule
+    fine = np.linspace(edges[0], edges[-1], (len(edges) - 1) * samples + 1)
+    _, rho = kpm_dos(H, fine, **kwargs)
+    cumulative = np.concatenate([[0], np.cumsum((rho[1:] + rho[:-1]) / 2 * np.diff(fine))])
+    return np.diff(cumulative[::samples])
+
+def main():
+    print(f"{'n':>6}{'dense [s]':>11}{'tridiagonal [s]':>17}{'KPM [s]':>10}{'max bin error':>15}")
+    for n in (10**2, 10**3, 4000, 10**4):
+        epsilon = chain_onsite(n, 2, W = 1, seed = 1)
+        H = chain_hamiltonian(n, epsilon)
+        t_dense = timed(np.linalg.eigvalsh, H.toarray())[0] if n <= DENSE_MAX else np.nan
+        t_tri, evals = timed(chain_eigenvalues, n, epsilon)
+
+        edges = np.linspace(*spectral_bounds(H), BINS + 1)
+        exact = np.histogram(evals, edges)[0]
+        t_kpm, counts = timed(binned, H, edges, moments = 256, vectors = 32, seed = 0)
+        # Error in the number of states per bin, relative to the number of states
+        print(f"{n:>6}{t_dense:>11.3f}{t_tri:>17.3f}{t_kpm:>10.3f}{np.abs(counts - exact).max() / n:>15.1e}")
+
+if __name__ == '__main__':
+    main()
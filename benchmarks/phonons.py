@@ -0,0 +1,44 @@
+#!/usr/bin/python
+
+"""
+phonons.py: batched phonon dispersion (phonons.phonon_frequencies) of FCC spring models against a loop over k-points
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import phonons
+from phonons import *
+
+K_POINTS = 10**6
+LOOP_POINTS = 10**4 # k-points of the per-point loop, whose time is scaled up to K_POINTS
+
+def timed(f, *args, **kwargs):
+    start = time.perf_counter()
+    out = f(*args, **kwargs)
+    return time.perf_counter() - start, out
+
+def loop(k, lattice, springs):
+    # One dynamical matrix and diagonalisation per k-point, the force constants being built once
+    d, coupling, restoring = phonons._force_constants(lattice, springs, 1)
+    n = int(np.sqrt(len(restoring)))
+    return np.array([np.sqrt(np.abs(np.linalg.eigvalsh((restoring - np.cos(d @ q) @ coupling).reshape(n, n))))
+                     for q in k])
+
+def main():
+    # Uniform k-points in the cube of side 4 pi around Gamma, which holds the first zone of the FCC lattice
+    k = np.random.default_rng(0).uniform(-2*np.pi, 2*np.pi, (K_POINTS, 3))
+    print(f"{'shells':>7}{'springs':>9}{'batched [s]':>13}{'loop [s]':>10}{'speed-up':>10}{'max difference':>16}")
+    for kappa in ((1,), (1, .5), (1, .5, .25)):
+        springs = neighbour_springs('fcc', kappa)
+        t_batch, omega = timed(phonon_frequencies, k, 'fcc', springs)
+        t_loop, reference = timed(loop, k[:LOOP_POINTS], 'fcc', springs)
+        t_loop *= K_POINTS / LOOP_POINTS
+        error = np.abs(omega[:LOOP_POINTS] - reference).max()
+        print(f"{len(kappa):>7}{len(springs['i']):>9}{t_batch:>13.2f}{t_loop:>10.1f}{t_loop / t_batch:>10.0f}{error:>16.1e}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+#!/usr/bin/python
+
+"""
+tightbinding_chain.py: dense eigvalsh against the tridiagonal and closed-form chain solvers
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tightbinding import *
+
+# The original notebook implementation
+def dense(n, epsilon = 2, t = 1):
+    rhs = epsilon * np.eye(n, k = 0) - t * (np.eye(n, k = 1) + np.eye(n, k = -1))
+    return np.linalg.eigvalsh(rhs)
+
+def timed(f, *args):
+    start = time.perf_counter()
+    out = f(*args)
+    return time.perf_counter() - start, out
+
+def main():
+    print(f"{'n':>8} {'dense [s]':>10} {'tridiag [s]':>12} {'uniform [s]':>12} {'DOS [s]':>10} {'max |dE|':>10}")
+    for n in [100, 1000, 4000, 20000, 10**5, 10**6]:
+        onsite = chain_onsite(n, W = 1, seed = 0)
+        # The full tridiagonal spectrum is O(n^2), the Sturm-count histogram O(n)
+        t_tri = timed(chain_eigenvalues, n, onsite)[0] if n <= 20000 else np.nan
+        t_dos = timed(chain_dos, n, onsite)[0]
+        t_uni, e_uni = timed(chain_eigenvalues, n, 2)
+        if n <= 4000:
+            t_dense, e_dense = timed(dense, n)
+            err = np.abs(e_dense - e_uni).max()
+        else:
+            t_dense, err = np.nan, np.nan
+        print(f"{n:>8} {t_dense:>10.4f} {t_tri:>12.4f} {t_uni:>12.4f} {t_dos:>10.4f} {err:>10.1e}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/python
+
+"""
+brillouin.py: reciprocal lattices, Brillouin zones and folding of k-points for the lattices of crystal.py
+"""
+
+import itertools
+from functools import lru_cache
+
+from scipy.spatial import Voronoi, ConvexHull
+
+from SSP import *
+from crystal import LATTICES
+
+CHUNK = 2**22 # number of (k-point, reciprocal lattice vector) pairs compared at a time
+
+# A lattice is a name in crystal.LATTICES or an array of lattice vectors (rows); the zone geometry is cached
+# per lattice, so repeated calls on large k-grids only pay for the comparisons.
+
+def _key(lattice):
+    # Hashable form of a lattice, for the caches
+    if isinstance(lattice, str):
+        return lattice
+    return tuple(map(tuple, np.atleast_2d(np.asarray(lattice, dtype=float))))
+
+def _vectors(key):
+    return np.atleast_2d(np.asarray(LATTICES[key][0] if isinstance(key, str) else key, dtype=float))
+
+def reciprocal_vectors(lattice):
+
+    """
+    Primitive reciprocal lattice vectors, b_i . a_j = 2 pi delta_ij
+
+    Input:
+    ---
+    lattice: name in crystal.LATTICES or the lattice vectors as rows
+
+    Returns:
+    ---
+    The reciprocal vectors as rows, as b1, b2 = ... in 4-2-kspace
+
+    """
+
+    return 2 * np.pi * np.linalg.inv(_vectors(_key(lattice))).T
+
+@lru_cache(maxsize=None)
+def _points(key, m):
+    # Reciprocal lattice vectors with integer coordinates in [-m, m], without 0, sorted by length
+    B = reciprocal_vectors(key)
+    n = np.array(list(itertools.product(range(-m, m+1), repeat=len(B))))
+    G = n @ B
+    norm = np.linalg.norm(G, axis=1)
+    order = np.argsort(norm, kind='stable')[1:]
+    return G[order], norm[order]
+
+def reciprocal_points(lattice, radius):
+    # All reciprocal lattice vectors G != 0 with |G| <= radius, sorted by length
+    key = _key(lattice)
+    # The integer coordinates of G are bounded by |G| |a_i| / 2 pi
+    m = int(np.ceil(radius * np.linalg.norm(_vectors(key), axis=1).max() / (2 * np.pi)))
+    G, norm = _points(key, max(m, 1))
+    n = np.searchsorted(norm, radius * (1 + 1e-12), 'right')
+    return G[:n]
+
+######### Zones #########
+
+def zone_index(k, lattice):
+
+    """
+    Brillouin zone of every k-point from the Bragg-plane construction: the n-th zone is reached
+    from Gamma by crossing n - 1 Bragg planes
+
+    Input:
+    ---
+    k: k-points, array of shape (..., dim)
+    lattice: name in crystal.LATTICES or the lattice vectors as rows
+
+    Returns:
+    ---
+    An integer array of shape k.shape[:-1] (1 for the first zone); points on a Bragg plane
+    belong to the lower zone
+
+    """
+
+    k = np.asarray(k, dtype=float)
+    shape, dim = k.shape[:-1], k.shape[-1]
+    k = k.reshape(-1, dim)
+    # Only the planes closer to Gamma than the furthest k-point (|G|/2 < |k|) can be crossed
+    G = reciprocal_points(lattice, 2 * np.linalg.norm(k, axis=1).max(initial=0))
+    half = (G**2).sum(1) / 2
+
+    zone = np.ones(len(k), dtype=np.int64)
+    step = max(1, CHUNK // max(len(G), 1))
+    for start in range(0, len(k), step):
+        # k lies beyond the Bragg plane of G when k.G > |G|^2 / 2
+        zone[start:start+step] += (k[start:start+step] @ G.T > half).sum(1)
+    return zone.reshape(shape)
+
+def zone_mask(kx, ky, lattice, n = 1):
+    # Mask of the k-points of a 2D grid (broadcastable kx, ky) in the n-th zone, like first_BZ in 5-2-bands
+    kx, ky = np.broadcast_arrays(kx, ky)
+    return zone_index(np.stack([kx, ky], axis=-1), lattice) == n
+
+def fold(k, lattice):
+
+    """
+    Map k-points into the first Brillouin zone
+
+    Input:
+    ---
+    k: k-points, array of shape (..., dim)
+    lattice: name in crystal.LATTICES or the lattice vectors as rows
+
+    Returns:
+    ---
+    The folded k-points k - G, with G the reciprocal lattice vector closest to k
+
+    """
+
+    k = np.asarray(k, dtype=float)
+    B = reciprocal_vectors(lattice)
+    dim = len(B)
+    # Nearest G: round the reciprocal-lattice coordinates, then try the neighbouring cells as well
+    offsets = np.array(list(itertools.product((-1, 0, 1), repeat=dim))) @ B
+    G = np.rint(k @ np.linalg.inv(B)) @ B
+    best = k - G
+    for offset in offsets:
+        trial = k - G - offset
+        closer = (trial**2).sum(-1) < (best**2).sum(-1) - 1e-12
+        best = np.where(closer[..., None], trial, best)
+    return best
+
+@lru_cache(maxsize=None)
+def _first_zone(key):
+    B = reciprocal_vectors(key)
+    if len(B) == 1:
+        return np.array([[-B[0, 0] / 2], [B[0, 0] / 2]])
+    # Voronoi cell of Gamma among its neighbours
+    G = np.vstack([np.zeros(len(B)), reciprocal_points(key, 2 * np.linalg.norm(B, axis=1).max() * len(B))])
+    voronoi = Voronoi(G)
+    vertices = voronoi.vertices[voronoi.regions[voronoi.point_region[0]]]
+    if len(B) == 2:
+        # Ordered around Gamma, closing the polygon
+        vertices = vertices[np.argsort(np.arctan2(vertices[:, 1], vertices[:, 0]))]
+        return np.vstack([vertices, vertices[:1]])
+    return vertices
+
+def first_zone(lattice):
+
+    """
+    Corners of the first Brillouin zone, the Wigner-Seitz cell of the reciprocal lattice
+
+    Input:
+    ---
+    lattice: name in crystal.LATTICES or the lattice vectors as rows
+
+    Returns:
+    ---
+    1D: the zone edges; 2D: the corners in order around Gamma, the first repeated at the end
+    (ready to plot, like the hexagon in Graphene.ipynb); 3D: the corners, with the faces as the
+    triangles of scipy.spatial.ConvexHull of them (see zone_faces)
+
+    """
+
+    return _first_zone(_key(lattice)).copy()
+
+def zone_faces(lattice):
+    # Triangles (index triples into first_zone) covering the surface of a 3D first zone
+    return ConvexHull(first_zone(lattice)).simplices
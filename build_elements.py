@@ -0,0 +1,146 @@
+#!/usr/bin/python
+
+"""
+build_elements.py: rebuild the bundled element properties (elements.csv) from saved Wikipedia data pages
+
+Usage: python build_elements.py [--heat-capacity PAGE.html] [--expansion PAGE.html] [--output FILE]
+
+The pages are 'Heat capacities of the elements (data page)' and 'Thermal expansion coefficients of the
+elements (data page)' saved from a browser; a property whose page is not given keeps its current values.
+"""
+
+import os
+import re
+import sys
+import argparse
+from html.parser import HTMLParser
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+
+from SSP import np, ELEMENTS, load_elements
+
+# For each property, the label of the row read in every element's block of the page and a piece of the unit
+# that identifies the value column, as chosen by 1-1-specificheatI when it read the live pages
+SOURCES = {
+    'heat_capacity' : ('CRC', 'J/(mol'),
+    'expansion' : ('use', 'K−1'),
+}
+ELEMENT_ROW = re.compile(r'(\d+)\s+([A-Z][a-z]?)\s+([A-Za-z]+)') # e.g. '47 Ag silver', starting a block
+NUMBER = re.compile(r'[-+]?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?')
+
+######### Parsing #########
+
+class TableParser(HTMLParser):
+    # Collects every table of a page as a list of rows of cell texts, cells spanning columns repeated
+
+    def __init__(self):
+        super().__init__()
+        self.tables, self._row, self._cell, self._span = [], None, None, 1
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'table':
+            self.tables.append([])
+        elif tag == 'tr' and self.tables:
+            self._row = []
+        elif tag in ('td', 'th') and self._row is not None:
+            self._cell = []
+            self._span = int(dict(attrs).get('colspan') or 1)
+        elif tag == 'br' and self._cell is not None:
+            self._cell.append(' ')
+
+    def handle_endtag(self, tag):
+        if tag in ('td', 'th') and self._cell is not None:
+            text = ' '.join(''.join(self._cell).split())
+            self._row.extend([text] * self._span)
+            self._cell = None
+        elif tag == 'tr' and self._row is not None:
+            self.tables[-1].append(self._row)
+            self._row = None
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+
+def parse_value(text):
+    # The number in a cell, ignoring footnote marks and parenthesised remarks such as '(at 25 °C)'
+    text = re.sub(r'\[[^\]]*\]|\([^)]*\)', ' ', text.replace('−', '-'))
+    match = NUMBER.search(text)
+    return float(match.group()) if match else np.nan
+
+def parse_page(filename, label, unit):
+
+    """
+    Read one property of every element from a saved data page
+
+    Input:
+    ---
+    filename: the html file
+    label: first cell of the row read in each element's block, e.g. 'CRC'
+    unit: part of the header of the value column, e.g. 'J/(mol'
+
+    Returns:
+    ---
+    A dictionary {Z: (symbol, name, value)}
+
+    """
+
+    parser = TableParser()
+    with open(filename, encoding='utf-8') as f:
+        parser.feed(f.read())
+
+    values = {}
+    for rows in parser.tables:
+        column, current = None, None
+        for row in rows:
+            if column is None:
+                column = next((i for i, cell in enumerate(row) if unit in cell), None)
+                continue
+            match = ELEMENT_ROW.search(row[0]) if row else None
+            if match:
+                current = int(match.group(1)), match.group(2), match.group(3).capitalize()
+            elif current and row[0] == label and column < len(row) and current[0] not in values:
+                values[current[0]] = current[1:] + (parse_value(row[column]),)
+    return values
+
+######### Main #########
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Rebuild the element properties from saved data pages')
+    parser.add_argument('--heat-capacity', help = "saved 'Heat capacities of the elements (data page)'")
+    parser.add_argument('--expansion', help = "saved 'Thermal expansion coefficients of the elements (data page)'")
+    parser.add_argument('--output', default = ELEMENTS, help = 'element file to update')
+    args = parser.parse_args(argv)
+
+    records = {}
+    if os.path.exists(args.output):
+        for r in load_elements(args.output, cache = False):
+            records[int(r['Z'])] = dict(symbol = str(r['symbol']), element = str(r['element']),
+                                        heat_capacity = float(r['heat_capacity']), expansion = float(r['expansion']))
+
+    for key, page in (('heat_capacity', args.heat_capacity), ('expansion', args.expansion)):
+        if page is None:
+            continue
+        values = parse_page(page, *SOURCES[key])
+        if not values:
+            print(f"{page}: no '{SOURCES[key][0]}' rows found, {key} left unchanged")
+            continue
+        # The page replaces every value of its property
+        for record in records.values():
+            record[key] = np.nan
+        for Z, (symbol, name, value) in values.items():
+            records.setdefault(Z, dict(symbol = symbol, element = name, heat_capacity = np.nan, expansion = np.nan))
+            records[Z][key] = value
+        print(f"{page}: {sum(np.isfinite(v[2]) for v in values.values())} values of {key}")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        f.write('Z,symbol,element,heat_capacity,expansion\n')
+        for Z in sorted(records):
+            r = records[Z]
+            cells = ['' if np.isnan(r[k]) else f'{r[k]:.6g}' for k in ('heat_capacity', 'expansion')]
+            f.write(f"{Z},{r['symbol']},{r['element']},{','.join(cells)}\n")
+    print(f"{len(records)} elements written to {args.output}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
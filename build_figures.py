@@ -0,0 +1,235 @@
+#!/usr/bin/python
+
+"""
+build_figures.py: export every course figure in parallel, skipping those whose inputs are unchanged
+
+Usage: python build_figures.py [--jobs N] [--force] [--only PATTERN] [--list] [--compact]
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import glob
+import fnmatch
+import hashlib
+import linecache
+import functools
+import argparse
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+MANIFEST = os.path.join(ROOT, '.figure_cache', 'build-manifest.json')
+
+# Calls that write a figure, used to find the notebook figure producers; the files a notebook really writes
+# are recorded while it runs (see _record_outputs), so outputs in disabled code or named by f-strings need
+# not be known in advance
+OUTPUT_PATTERN = re.compile(r"""(?:savefig\(\s*|filename\s*=\s*)f?['"]([^'"]+)['"]""")
+
+######### Discovery #########
+
+def _notebook_source(path):
+    # The (cell index, source) of every code cell
+    with open(path, encoding='utf-8') as f:
+        cells = json.load(f)['cells']
+    return [(i, ''.join(c['source'])) for i, c in enumerate(cells) if c['cell_type'] == 'code']
+
+def _active_outputs(source):
+    # Output files named in lines that are not commented out, f-string names with their fields unfilled
+    lines = [l for l in source.splitlines() if not l.lstrip().startswith('#')]
+    return OUTPUT_PATTERN.findall('\n'.join(lines))
+
+def discover():
+
+    """
+    Find every figure producer: the crystal.py builders and the notebooks that save figures
+
+    Returns:
+    ---
+    A dictionary {producer name: (kind, target, outputs named literally in the source, input files); the
+    html files of crystal.FIGURES belong to their builders only, even when a notebook also shows the figure
+
+    """
+
+    producers = {}
+    crystal_inputs = [os.path.join(ROOT, f) for f in ('crystal.py', 'SSP.py')]
+
+    sys.path.insert(0, ROOT)
+    from crystal import FIGURES
+    for filename, build in FIGURES.items():
+        producers[f'crystal:{build.__name__}'] = ('crystal', filename, [filename], crystal_inputs)
+
+    local = {os.path.basename(f) for f in glob.glob(os.path.join(ROOT, '*')) if os.path.isfile(f)}
+    for path in sorted(glob.glob(os.path.join(ROOT, '*.ipynb'))):
+        source = '\n'.join(cell for _, cell in _notebook_source(path))
+        outputs = _active_outputs(source)
+        if not outputs:
+            continue
+        outputs = [o for o in outputs if '{' not in o and o not in FIGURES]
+        # Inputs: the notebook, SSP.py, and any local module or data file it mentions, except its own outputs
+        inputs = [path, os.path.join(ROOT, 'SSP.py')]
+        for name in sorted(local - set(outputs)):
+            stem, ext = os.path.splitext(name)
+            if ext != '.ipynb' and (name in source or (ext == '.py' and re.search(rf'\b(import|from)\s+{stem}\b', source))):
+                inputs.append(os.path.join(ROOT, name))
+        producers[f'notebook:{os.path.basename(path)}'] = ('notebook', path, outputs, sorted(set(inputs)))
+    return producers
+
+def input_hash(files):
+    digest = hashlib.sha256()
+    for f in files:
+        digest.update(os.path.basename(f).encode())
+        with open(f, 'rb') as fh:
+            digest.update(fh.read())
+    return digest.hexdigest()
+
+######### Workers #########
+
+def _init_worker():
+    # Every worker renders headless with its own Agg backend and never opens a browser
+    os.environ['MPLBACKEND'] = 'Agg'
+    import matplotlib
+    matplotlib.use('Agg')
+    import webbrowser
+    webbrowser.open = lambda *args, **kwargs: False
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)
+
+def _record_outputs(written):
+    # Wrap the matplotlib and plotly writers so that the names of the files they write are added to written
+    import matplotlib.figure
+    import plotly.offline
+    import plotly.basedatatypes
+
+    def wrap(owner, attr, name_of):
+        original = getattr(owner, attr)
+        @functools.wraps(original)
+        def writer(*args, **kwargs):
+            name = name_of(*args, **kwargs)
+            if isinstance(name, (str, os.PathLike)):
+                written.add(os.path.relpath(os.path.abspath(name), ROOT))
+            return original(*args, **kwargs)
+        setattr(owner, attr, writer)
+        return original
+
+    def html(name):
+        name = str(name)
+        return name if name.endswith('.html') else name + '.html'
+
+    return [
+        (matplotlib.figure.Figure, 'savefig', wrap(matplotlib.figure.Figure, 'savefig',
+                                                    lambda fig, fname, *a, **k: fname)),
+        (plotly.offline, 'plot', wrap(plotly.offline, 'plot', lambda fig, *a, **k: html(k.get('filename', 'temp-plot.html'))
+                                     if k.get('output_type', 'file') == 'file' else None)),
+        (plotly.basedatatypes.BaseFigure, 'write_html', wrap(plotly.basedatatypes.BaseFigure, 'write_html',
+                                                             lambda fig, file, *a, **k: file)),
+    ]
+
+def _skip_figure_exports():
+    # The crystal.py figures a notebook displays are exported by their own producers, so that every file
+    # has a single writer; the notebook's export_html calls return without writing
+    import crystal
+    export_html = crystal.export_html
+    @functools.wraps(export_html)
+    def export_unowned(fig, filename, *args, **kwargs):
+        if os.path.basename(filename if filename.endswith('.html') else filename + '.html') in crystal.FIGURES:
+            return filename
+        return export_html(fig, filename, *args, **kwargs)
+    crystal.export_html = export_unowned
+    return [(crystal, 'export_html', export_html)]
+
+def _run_notebook(path):
+    import matplotlib.pyplot as plt
+    plt.show = lambda *args, **kwargs: None
+    namespace = {'__name__': '__main__'}
+    for i, source in _notebook_source(path):
+        # Blank out IPython magics and shell escapes, keeping the line numbers of the cell
+        code = '\n'.join('' if l.lstrip().startswith(('%', '!')) else l for l in source.splitlines())
+        # Compiled under the name of the cell, which tracebacks show with its lines
+        name = f'{path}[cell {i}]'
+        linecache.cache[name] = (len(code), None, code.splitlines(True), name)
+        exec(compile(code, name, 'exec'), namespace)
+        plt.close('all')
+
+def run(name, kind, target, compact = False):
+    # Returns the name, the time taken, the error (None on success) and the files written
+    start = time.perf_counter()
+    written = set()
+    try:
+        if kind == 'crystal':
+            import crystal
+            build = {b.__name__: b for b in crystal.FIGURES.values()}[name.split(':', 1)[1]]
+            written.add(crystal.export_html(build(), target, auto_open = False, compact = compact))
+            if compact:
+                # The plotly.js bundle the compact html loads from its directory
+                written.add(os.path.join(os.path.dirname(target), 'plotly.min.js'))
+        else:
+            wrapped = _record_outputs(written) + _skip_figure_exports()
+            try:
+                _run_notebook(target)
+            finally:
+                for owner, attr, original in wrapped:
+                    setattr(owner, attr, original)
+        return name, time.perf_counter() - start, None, sorted(written)
+    except Exception:
+        return name, time.perf_counter() - start, traceback.format_exc(limit = 3), sorted(written)
+
+######### Main #########
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Export every course figure in parallel')
+    parser.add_argument('--jobs', '-j', type = int, default = None, help = 'number of worker processes')
+    parser.add_argument('--force', action = 'store_true', help = 'rebuild even if the inputs are unchanged')
+    parser.add_argument('--only', default = '*', help = 'glob pattern on the producer names')
+    parser.add_argument('--list', action = 'store_true', help = 'list the producers and exit')
+    parser.add_argument('--compact', action = 'store_true',
+                        help = 'export the crystal.py figures as compact html sharing one plotly.min.js')
+    args = parser.parse_args(argv)
+
+    producers = {k: v for k, v in discover().items() if fnmatch.fnmatch(k, args.only)}
+    if args.list:
+        for name, (_, _, outputs, inputs) in producers.items():
+            print(f"{name:<40} -> {', '.join(outputs) or '(named when run)'}")
+        return 0
+
+    try:
+        with open(MANIFEST) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+
+    # Skip producers whose inputs are unchanged and whose outputs, as written by their last run, all exist
+    todo = {}
+    for name, (kind, target, outputs, inputs) in producers.items():
+        digest = input_hash(inputs) + ('-compact' if args.compact and kind == 'crystal' else '')
+        entry = manifest.get(name)
+        current = isinstance(entry, dict) and entry.get('digest') == digest
+        if args.force or not current or not all(os.path.exists(os.path.join(ROOT, o)) for o in entry['outputs']):
+            todo[name] = (kind, target, digest)
+        else:
+            print(f"{name:<40} {'up to date':>12}")
+
+    failures = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(args.jobs, initializer = _init_worker) as pool:
+        futures = [pool.submit(run, name, kind, target, args.compact) for name, (kind, target, _) in todo.items()]
+        for future in as_completed(futures):
+            name, seconds, error, written = future.result()
+            if error is None:
+                manifest[name] = dict(digest = todo[name][2], outputs = written)
+                print(f"{name:<40} {seconds:>11.2f}s")
+            else:
+                failures += 1
+                manifest.pop(name, None)
+                print(f"{name:<40} {'FAILED':>12}\n{error}")
+
+    os.makedirs(os.path.dirname(MANIFEST), exist_ok = True)
+    with open(MANIFEST, 'w') as f:
+        json.dump(manifest, f, indent = 1, sort_keys = True)
+    print(f"{len(todo)} built, {len(producers) - len(todo)} skipped, {failures} failed in {time.perf_counter() - start:.2f}s")
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -5,18 +5,112 @@
 Crystal.py: a program to make content for the crystals section of the course
 """
 
+import os
+import json
+import base64
+import hashlib
+import functools
+
 from SSP import *
+from scipy.spatial import cKDTree
 
 """
 Basic functions
 """
 
+BOND_TOL = 1e-6 # tolerance used when bonds are selected by an exact length
+
+# Primitive lattice vectors (rows) and basis of the lattices used in the course, bond length or cubic cell 1
+LATTICES = {
+    'chain': (np.array([[1.]]), np.array([[0.]])),
+    'square': (np.eye(2), np.zeros((1, 2))),
+    'triangular': (np.array([[1, 0], [.5, np.sqrt(3)/2]]), np.zeros((1, 2))),
+    'honeycomb': (np.array([[np.sqrt(3), 0], [np.sqrt(3)/2, 3/2]]), np.array([[0, 0], [0, 1]])),
+    'sc': (np.eye(3), np.zeros((1, 3))),
+    'bcc': (np.array([[-1, 1, 1], [1, -1, 1], [1, 1, -1]])/2, np.zeros((1, 3))),
+    'fcc': (np.array([[0, 1, 1], [1, 0, 1], [1, 1, 0]])/2, np.zeros((1, 3))),
+    'diamond': (np.array([[0, 1, 1], [1, 0, 1], [1, 1, 0]])/2, np.array([[0, 0, 0], [1, 1, 1]])/4),
+}
+
+# Conventional cubic cells with the basis written out, as drawn in FCC() and diamond()
+_fcc_basis = np.array([[0, 0, 0], [0, .5, .5], [.5, .5, 0], [.5, 0, .5]])
+LATTICES['bcc_conventional'] = (np.eye(3), np.array([[0, 0, 0], [.5, .5, .5]]))
+LATTICES['fcc_conventional'] = (np.eye(3), _fcc_basis)
+LATTICES['diamond_conventional'] = (np.eye(3), np.vstack([_fcc_basis, _fcc_basis + 1/4]))
+
+# Integer cell coordinates of cells [start, start+N) in each direction, the first coordinate varying fastest
+def _cell_indices(N, start, dim, first = 0, stop = None):
+    N = np.broadcast_to(N, (dim,))
+    start = np.broadcast_to(start, (dim,))
+    flat = np.arange(first, np.prod(N) if stop is None else stop)
+    return np.array(np.unravel_index(flat, N[::-1]))[::-1].T + start
+
+# Produces the lattice points (with a basis) in any dimension from one matmul
+def lattice_points(vectors, N = 10, basis = None, start = None, dtype = float):
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=dtype))
+    dim = vectors.shape[1]
+    basis = np.zeros((1, dim), dtype=dtype) if basis is None else np.atleast_2d(np.asarray(basis, dtype=dtype))
+    start = (-np.asarray(N))//2 if start is None else start
+    cells = _cell_indices(N, start, len(vectors)).astype(dtype) @ vectors
+    # All atoms of the first basis site, then all of the second, ...
+    return (basis[:, None, :] + cells[None, :, :]).reshape(-1, dim)
+
+# As lattice_points, but yields the points in chunks of at most chunk cells to bound the memory used
+def iter_lattice_points(vectors, N = 10, basis = None, start = None, dtype = float, chunk = 2**16):
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=dtype))
+    dim = vectors.shape[1]
+    basis = np.zeros((1, dim), dtype=dtype) if basis is None else np.atleast_2d(np.asarray(basis, dtype=dtype))
+    start = (-np.asarray(N))//2 if start is None else start
+    total = int(np.prod(np.broadcast_to(N, (len(vectors),))))
+    for first in range(0, total, chunk):
+        cells = _cell_indices(N, start, len(vectors), first, min(first + chunk, total)).astype(dtype) @ vectors
+        yield (basis[:, None, :] + cells[None, :, :]).reshape(-1, dim)
+
+# Produces one of the named lattices in LATTICES
+def named_lattice(name, N = 10, start = None, dtype = float):
+    vectors, basis = LATTICES[name]
+    return lattice_points(vectors, N, basis, start, dtype)
+
 # Produces the lattice to be fed into plotly
 def lattice_generation(a1,a2,N = 10):
-    grid = np.arange(-N//2,N//2,1)
-    xGrid, yGrid = np.meshgrid(grid,grid)
-    return np.reshape(np.kron(xGrid.flatten(),a1),(-1,2))+np.reshape(np.kron(yGrid.flatten(),a2),(-1,2))
-
+    return lattice_points([a1, a2], N)
+
+
+# Finds all bonds with r_min <= length <= r_max using a k-d tree, either within points or between points and others
+def bonds(points, r_max, others = None, r_min = 0):
+    points = np.asarray(points, dtype=float)
+    tree = cKDTree(points)
+    if others is None:
+        pairs = tree.query_pairs(r_max, output_type='ndarray')
+        start, end = points[pairs[:, 0]], points[pairs[:, 1]]
+    else:
+        others = np.asarray(others, dtype=float)
+        dist = tree.sparse_distance_matrix(cKDTree(others), r_max, output_type='ndarray')
+        start, end = points[dist['i']], others[dist['j']]
+    keep = np.linalg.norm(end - start, axis=1) >= r_min
+    start, end = start[keep], end[keep]
+
+    # Segments separated by gaps; plotly treats nan like None but the arrays stay numeric
+    edges = np.stack([start, end, np.full_like(start, np.nan)], axis=1)
+    return tuple(edges.reshape(-1, points.shape[1]).T)
+
+GL_THRESHOLD = 1000 # traces with more points than this are drawn with WebGL
+VIEW_MARGIN = 1.5 # distance kept around the axis ranges by viewport decimation, longer than any bond drawn
+
+# A 2D scatter trace, go.Scattergl above threshold points since SVG markers become unresponsive in the browser
+def lattice_trace(x, y, threshold = GL_THRESHOLD, **kwargs):
+    trace = go.Scattergl if np.size(x) > threshold else go.Scatter
+    return trace(x = x, y = y, **kwargs)
+
+# As lattice_points, keeping only the points inside view = (x_range, y_range) widened by margin; the
+# lattice is generated in chunks so the full lattice (e.g. 10^6 sites) is never held in memory
+def viewport_points(vectors, N = 10, basis = None, view = None, margin = VIEW_MARGIN, chunk = 2**16):
+    if view is None:
+        return lattice_points(vectors, N, basis)
+    lo, hi = np.sort(np.asarray(view, dtype=float), axis=1).T
+    parts = [p[np.all((p >= lo - margin) & (p <= hi + margin), axis=1)]
+             for p in iter_lattice_points(vectors, N, basis, chunk = chunk)]
+    return np.concatenate(parts)
 
 # Produces the dotted lines of the unit cell
 def dash_contour(a1,a2, vec_zero = np.array([0,0]), color='Red'):
@@ -69,6 +163,194 @@ def make_arrow(vec,text,color = 'Red',vec_zero = [0,0], text_shift = [-0.2,-0.1]
         ]
     return annot
 
+# Sliders over scaled copies of one drawing: scaling everything on a pair of axes by s is the same as dividing
+# their ranges by s (marker sizes and line widths are in pixels), so each step is a relayout of the ranges and
+# the traces are stored once, whatever the slider resolution. axes lists (x axis, y axis, power) for panels
+# drawn at scale 1 that should appear scaled by s**power, e.g. ('xaxis2', 'yaxis2', -1) for a reciprocal lattice
+def scaled_ranges(axes, scale, plot_range):
+    ranges = {}
+    for x, y, power in axes:
+        r = plot_range / scale**power
+        ranges[f'{x}.range'] = ranges[f'{y}.range'] = [-r, r]
+    return ranges
+
+def scale_slider(axes, scales, plot_range, active = 0, label = None, **kwargs):
+    steps = [dict(method = 'relayout', label = f'{s:.3g}' if label is None else label,
+                  args = [scaled_ranges(axes, s, plot_range)]) for s in scales]
+    return dict(active = active, steps = steps, **kwargs)
+
+
+"""
+Figure cache
+"""
+
+# Built figures are memoised in-process and as JSON on disk, keyed on the builder, its arguments and this file
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.figure_cache')
+with open(os.path.abspath(__file__), 'rb') as _source:
+    SOURCE_HASH = hashlib.sha256(_source.read()).hexdigest()[:16]
+
+_figures = {} # key -> figure dictionary
+_figure_keys = {} # id(figure) -> key, so render() knows whether an exported html file is current
+
+def figure_key(name, *args, **kwargs):
+    text = repr((name, args, sorted(kwargs.items()), SOURCE_HASH))
+    return hashlib.sha256(text.encode()).hexdigest()[:24]
+
+# Write text to path via a temporary file so concurrent readers never see a partial file
+def _write_atomic(path, text):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok = True)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            f.write(text)
+        os.replace(tmp, path)
+    except OSError:
+        pass # the cache is an optimisation only
+
+# Decorator for the pure "build figure" functions; the returned figure dictionary is shared, so treat it as read-only
+def cached_figure(build):
+    @functools.wraps(build)
+    def wrapper(*args, **kwargs):
+        key = figure_key(build.__name__, *args, **kwargs)
+        if key not in _figures:
+            path = os.path.join(CACHE_DIR, f'{build.__name__}-{key}.json')
+            try:
+                with open(path) as f:
+                    fig = json.load(f)
+            except (OSError, ValueError):
+                import plotly.io as pio
+                text = pio.to_json(build(*args, **kwargs))
+                fig = json.loads(text)
+                _write_atomic(path, text)
+            _figures[key] = fig
+            _figure_keys[id(fig)] = key
+        return _figures[key]
+    return wrapper
+
+"""
+Compact export
+"""
+
+TYPED_KEYS = ('x', 'y', 'z') # numeric trace arrays stored as float32 typed arrays in compact html
+STYLE_SKIP = {'x', 'y', 'z', 'text', 'name', 'visible', 'type'} # per-trace keys never moved into the template
+
+# Plotly.js typed-array spec of a numeric array (a list, an array or a typed-array spec); None becomes nan, a gap in a line
+def typed_array(values, dtype = 'f4'):
+    if isinstance(values, dict) and 'bdata' in values:
+        values = np.frombuffer(base64.b64decode(values['bdata']), dtype=values['dtype']).reshape(values.get('shape', -1))
+    try:
+        values = np.array(values, dtype=dtype)
+    except (TypeError, ValueError):
+        return values # not numeric, left as it is
+    spec = dict(dtype = dtype, bdata = base64.b64encode(values.tobytes()).decode('ascii'))
+    if values.ndim > 1:
+        spec['shape'] = ','.join(map(str, values.shape))
+    return spec
+
+# The nested items shared (with equal values) by all the dictionaries
+def _common(dicts):
+    shared = {}
+    for key, value in dicts[0].items():
+        values = [d.get(key) for d in dicts]
+        if isinstance(value, dict) and all(isinstance(v, dict) for v in values):
+            nested = _common(values)
+            if nested:
+                shared[key] = nested
+        elif all(key in d and v == value for d, v in zip(dicts, values)):
+            shared[key] = value
+    return shared
+
+# d without the nested items of shared
+def _subtract(d, shared):
+    out = {}
+    for key, value in d.items():
+        if key not in shared:
+            out[key] = value
+        elif isinstance(value, dict) and isinstance(shared[key], dict):
+            rest = _subtract(value, shared[key])
+            if rest:
+                out[key] = rest
+    return out
+
+# Recursive update of a copy of a with b
+def _merge(a, b):
+    out = dict(a)
+    for key, value in b.items():
+        out[key] = _merge(out[key], value) if isinstance(value, dict) and isinstance(out.get(key), dict) else value
+    return out
+
+def compact_figure(fig):
+
+    """
+    A smaller copy of a figure dictionary for html export
+
+    Input:
+    ---
+    fig: figure dictionary (e.g. from a build_ function), left unchanged
+
+    Returns:
+    ---
+    A figure dictionary with the x, y, z arrays as float32 typed arrays and the styles shared by
+    every trace of a type moved into layout.template, which plotly applies to each of them
+
+    """
+
+    data = []
+    for trace in fig['data']:
+        trace = dict(trace)
+        for key in TYPED_KEYS:
+            if key in trace:
+                trace[key] = typed_array(trace[key])
+        data.append(trace)
+
+    layout = dict(fig.get('layout', {}))
+    template = dict(layout.get('template', {}))
+    defaults = dict(template.get('data', {}))
+    for kind in {trace.get('type', 'scatter') for trace in data}:
+        group = [i for i, trace in enumerate(data) if trace.get('type', 'scatter') == kind]
+        if len(group) < 2:
+            continue
+        shared = _common([{k: v for k, v in data[i].items() if k not in STYLE_SKIP} for i in group])
+        if not shared:
+            continue
+        for i in group:
+            data[i] = _subtract(data[i], shared)
+        # Template traces are cycled over the traces of their type, so every entry receives the shared style
+        defaults[kind] = [_merge(entry, shared) for entry in defaults.get(kind, [{}])]
+    template['data'] = defaults
+    layout['template'] = template
+    return dict(data = data, layout = layout)
+
+"""
+Export and display
+"""
+
+# Exports a built figure to html, skipping the write when the file already holds the same figure;
+# compact html stores float32 coordinates and loads plotly.min.js from a file shared by the directory
+def export_html(fig, filename, auto_open = True, compact = False):
+    if not filename.endswith('.html'):
+        filename += '.html'
+    key = _figure_keys.get(id(fig))
+    key = key and key + ('-compact' if compact else '')
+    stamp = os.path.join(CACHE_DIR, hashlib.sha256(os.path.abspath(filename).encode()).hexdigest()[:16] + '.key')
+    if key is not None and os.path.exists(filename) and os.path.exists(stamp):
+        with open(stamp) as f:
+            if f.read() == key:
+                return filename
+    if compact:
+        py.plot(compact_figure(fig), filename = filename, auto_open = auto_open, validate = False,
+                include_plotlyjs = 'directory')
+    else:
+        py.plot(fig, filename = filename, auto_open = auto_open, validate = False)
+    if key is not None:
+        _write_atomic(stamp, key)
+    return filename
+
+# The "render" step: display a built figure and optionally export it
+def render(fig, filename = None, compact = False, auto_open = True):
+    py.iplot(fig, validate = False)
+    if filename is not None:
+        export_html(fig, filename, auto_open = auto_open, compact = compact)
 
 """
 Crystal plots
@@ -78,19 +360,22 @@ Crystal plots
 # ################ simple lattice #################
 # #################################################
 
-def simple_lattice():
+@cached_figure
+def build_simple_lattice(N = 10, decimate = False):
     # Define the lattice vectors
     a1 = np.array([1,0])
     a2 = np.array([0,1])
     a1_alt = -a1-a2
     a2_alt = a1_alt + a1
     a2_c = np.array([0,np.sqrt(3)])
+    plot_range = 2.1
 
-    # Create the pattern
-    pattern_points = lattice_generation(a1,a2)
+    # Create the pattern, only the visible part when decimating
+    view = [(-plot_range, plot_range)]*2 if decimate else None
+    pattern_points = viewport_points([a1, a2], N, view = view)
 
     # Lattice Choice A
-    latticeA = go.Scatter(visible = True,x=pattern_points.T[0],y=pattern_points.T[1],mode='markers',marker=dict(
+    latticeA = lattice_trace(visible = True,x=pattern_points.T[0],y=pattern_points.T[1],mode='markers',marker=dict(
             color = 'Black',
             size = 10,
             )
@@ -132,7 +417,6 @@ def simple_lattice():
     )
 
     # Setting axis to invisible
-    plot_range = 2.1
     axis = dict(
             range=[-plot_range,plot_range],
             visible = False,
@@ -151,19 +435,18 @@ def simple_lattice():
         yaxis = axis
     )
 
-    # Displaying the figure
-    fig = dict(data = data, layout = layout)
-    py.iplot(fig, filename = 'lattice_basics')
+    return dict(data = data, layout = layout)
 
-
-    # html file
-    py.plot(fig, filename='4-1-simple_lattice.html')
+def simple_lattice(N = 10, decimate = False):
+    # Displaying the figure and the html file
+    render(build_simple_lattice(N, decimate), '4-1-simple_lattice.html')
 
 ##################################################
 # ################ periodic thing  #################
 # #################################################
 
-def periodic(save = False):
+@cached_figure
+def build_periodic(N = 10, decimate = False):
     # Define the lattice vectors
     vec_0 = np.array([-.5, 0])
     a1 = np.array([1, 0])
@@ -171,24 +454,26 @@ def periodic(save = False):
     a1_alt = -a1-a2
     a2_alt = a1_alt + a1
     a2_c = np.array([0,np.sqrt(3)])
+    plot_range = 2.1
 
-    # Create the pattern
-    pattern_points = lattice_generation(a1,a2)
-    pattern = go.Scatter(x=pattern_points.T[0],y=pattern_points.T[1],mode='markers',marker=dict(
+    # Create the pattern, only the visible part when decimating
+    view = [(-plot_range, plot_range)]*2 if decimate else None
+    pattern_points = viewport_points([a1, a2], N, view = view)
+    pattern = lattice_trace(x=pattern_points.T[0],y=pattern_points.T[1],mode='markers',marker=dict(
         color='Black',
         size = 20,
         symbol = 'hourglass-open')
         )
 
     # Lattice Choice A
-    latticeA = go.Scatter(visible = False, x = pattern_points.T[0],y = pattern_points.T[1],mode='markers',marker=dict(
+    latticeA = lattice_trace(visible = False, x = pattern_points.T[0],y = pattern_points.T[1],mode='markers',marker=dict(
             color = 'Red',
             size = 10,
             )
         )
 
     # Lattice Choice B
-    latticeB = go.Scatter(visible = False, x = pattern_points.T[0]+0.5,y = pattern_points.T[1],mode='markers',marker=dict(
+    latticeB = lattice_trace(visible = False, x = pattern_points.T[0]+0.5,y = pattern_points.T[1],mode='markers',marker=dict(
             color='Blue',
             size = 10,
             )
@@ -240,7 +525,6 @@ def periodic(save = False):
     )
 
     # Setting axis to invisible
-    plot_range = 2.1
     axis = dict(
             range=[-plot_range,plot_range],
             visible = False,
@@ -259,24 +543,27 @@ def periodic(save = False):
         yaxis = axis
     )
 
-    # Displaying the figure
-    fig = dict(data = data, layout = layout)
-    py.iplot(fig, filename = 'lattice_basics')
-    
-    if save:
-        # html file
-        py.plot(fig, filename='4-1-periodic.html')
+    return dict(data = data, layout = layout)
+
+def periodic(save = False, N = 10, decimate = False):
+    # Displaying the figure and optionally the html file
+    render(build_periodic(N, decimate), '4-1-periodic.html' if save else None)
 
 ##################################################
 # ##############  graphene single  ################
 # #################################################
 
-def graphene_single(save = False):
+@cached_figure
+def build_graphene_single(N = 10, decimate = False):
     # Define the lattice vectors
     a1 = np.array([np.sqrt(3),0])
     a2 = np.array([np.sqrt(3)/2,3/2])
     a2_c = np.array([0,3])
-    N_points = 10
+    N_points = N
+    # The view grows with N, except when decimating: like the 2.1 of the square lattices it then stays at
+    # the view of the default N = 10, so a large N only adds points outside it, which are dropped
+    plot_range = (10 if decimate else N_points)//3+0.3
+    shift = 1
 
     # Wigner-Seitz lines
     x_dotted = [np.sqrt(3)/2, -np.sqrt(3)/2, None, np.sqrt(3)/2,0, None, np.sqrt(3)/2, np.sqrt(3), None,
@@ -286,44 +573,21 @@ def graphene_single(save = False):
     WS_x = [0, 0, np.sqrt(3)/2, np.sqrt(3), np.sqrt(3), np.sqrt(3)/2, 0]
     WS_y = [1, 2, 2.5, 2, 1, 0.5, 1]
 
-    # New lattice generation
-    def graphene_generation(a1,a2,N = 10):
-        grid = np.arange(-N//2,N//2,1)
-        xGrid, yGrid = np.meshgrid(grid, grid[np.mod(grid+1,3) != 0])
-        return np.reshape(np.kron(xGrid*np.sqrt(3).flatten(),a1),(-1,2))+np.reshape(np.kron(yGrid.flatten(),a2),(-1,2))
-
-    # Creating interatomic lines
-    def create_lines(x, y):
-        x_edges = []
-        y_edges = []
-        for i in range(len(x)-1):
-            for j in range(i+1, len(x)-1):
-                vec_len = np.sqrt((x[j]-x[i])**2+(y[j]-y[i])**2)
-                if vec_len < 1.1:
-                    x_edges.extend([x[i], x[j], None])
-                    y_edges.extend([y[i], y[j], None])
-
-        return x_edges, y_edges
-
-    # Create the pattern
-    lat_vec1 = np.array([1,0])
-    lat_vec2 = np.array([0,1])
-    pattern_points = graphene_generation(lat_vec1, lat_vec2)
-
-    # Extracting data
-    xx = np.append(pattern_points.T[0], pattern_points.T[0] + np.sqrt(3)/2)
-    yy = np.append(pattern_points.T[1], pattern_points.T[1] + 3/2)
+    # Create the pattern, only the visible part when decimating
+    view = [(-plot_range+shift, plot_range+shift)]*2 if decimate else None
+    vectors, basis = LATTICES['honeycomb']
+    xx, yy = viewport_points(vectors, N_points, basis, view = view).T
 
     # Creating graphene structure
-    graph_struc = go.Scatter(visible = True, x = xx, y = yy, mode = 'markers', marker=dict(
+    graph_struc = lattice_trace(visible = True, x = xx, y = yy, mode = 'markers', marker=dict(
             color = 'Black',
             size = 10,
             )
         )
 
     # Creating lines      
-    x_edges, y_edges = create_lines(xx, yy)
-    line_trace = go.Scatter(name='edge',
+    x_edges, y_edges = bonds(np.column_stack([xx, yy]), 1.1)
+    line_trace = lattice_trace(name='edge',
                             x=x_edges,
                             y=y_edges,
                             mode='lines',
@@ -334,8 +598,6 @@ def graphene_single(save = False):
     data = [graph_struc, line_trace]
 
     # Setting axis to invisible
-    plot_range = N_points//3+0.3
-    shift = 1
     axis = dict(
             range=[-plot_range+shift, plot_range+shift],
             visible = False,
@@ -353,23 +615,27 @@ def graphene_single(save = False):
         yaxis = axis
     )
 
-    # Displaying the figure
-    fig = dict(data = data, layout = layout)
-    py.iplot(fig, filename = 'lattice_basics')
-    
-    if save:
-        py.plot(fig,  filename='4-1-graphene-single')
+    return dict(data = data, layout = layout)
+
+def graphene_single(save = False, N = 10, decimate = False):
+    # Displaying the figure and optionally the html file
+    render(build_graphene_single(N, decimate), '4-1-graphene-single.html' if save else None)
 
 ##################################################
 # ################    graphene    #################
 # #################################################
 
-def graphene(save = False):
+@cached_figure
+def build_graphene(N = 10, decimate = False):
     # Define the lattice vectors
     a1 = np.array([np.sqrt(3),0])
     a2 = np.array([np.sqrt(3)/2,3/2])
     a2_c = np.array([0,3])
-    N_points = 10
+    N_points = N
+    # The view grows with N, except when decimating: like the 2.1 of the square lattices it then stays at
+    # the view of the default N = 10, so a large N only adds points outside it, which are dropped
+    plot_range = (10 if decimate else N_points)//3+0.3
+    shift = 1
 
     # Wigner-Seitz lines
     x_dotted = [np.sqrt(3)/2, -np.sqrt(3)/2, None, np.sqrt(3)/2,0, None, np.sqrt(3)/2, np.sqrt(3), None,
@@ -379,44 +645,21 @@ def graphene(save = False):
     WS_x = [0, 0, np.sqrt(3)/2, np.sqrt(3), np.sqrt(3), np.sqrt(3)/2, 0]
     WS_y = [1, 2, 2.5, 2, 1, 0.5, 1]
 
-    # New lattice generation
-    def graphene_generation(a1,a2,N = 10):
-        grid = np.arange(-N//2,N//2,1)
-        xGrid, yGrid = np.meshgrid(grid, grid[np.mod(grid+1,3) != 0])
-        return np.reshape(np.kron(xGrid*np.sqrt(3).flatten(),a1),(-1,2))+np.reshape(np.kron(yGrid.flatten(),a2),(-1,2))
-
-    # Creating interatomic lines
-    def create_lines(x, y):
-        x_edges = []
-        y_edges = []
-        for i in range(len(x)-1):
-            for j in range(i+1, len(x)-1):
-                vec_len = np.sqrt((x[j]-x[i])**2+(y[j]-y[i])**2)
-                if vec_len < 1.1:
-                    x_edges.extend([x[i], x[j], None])
-                    y_edges.extend([y[i], y[j], None])
-
-        return x_edges, y_edges
-
-    # Create the pattern
-    lat_vec1 = np.array([1,0])
-    lat_vec2 = np.array([0,1])
-    pattern_points = graphene_generation(lat_vec1, lat_vec2)
-
-    # Extracting data
-    xx = np.append(pattern_points.T[0], pattern_points.T[0] + np.sqrt(3)/2)
-    yy = np.append(pattern_points.T[1], pattern_points.T[1] + 3/2)
+    # Create the pattern, only the visible part when decimating
+    view = [(-plot_range+shift, plot_range+shift)]*2 if decimate else None
+    vectors, basis = LATTICES['honeycomb']
+    xx, yy = viewport_points(vectors, N_points, basis, view = view).T
 
     # Creating graphene structure
-    graph_struc = go.Scatter(visible = True, x = xx, y = yy, mode = 'markers', marker=dict(
+    graph_struc = lattice_trace(visible = True, x = xx, y = yy, mode = 'markers', marker=dict(
             color = 'Black',
             size = 10,
             )
         )
 
     # Creating lines      
-    x_edges, y_edges = create_lines(xx, yy)
-    line_trace = go.Scatter(name='edge',
+    x_edges, y_edges = bonds(np.column_stack([xx, yy]), 1.1)
+    line_trace = lattice_trace(name='edge',
                             x=x_edges,
                             y=y_edges,
                             mode='lines',
@@ -424,10 +667,10 @@ def graphene(save = False):
                             line_color='black')
 
     # Creating lattice
-    lat_points = lattice_generation(a1, a2)
+    lat_points = viewport_points([a1, a2], N_points, view = view)
     x_lat = lat_points.T[0]
     y_lat = lat_points.T[1]
-    lattice = go.Scatter(visible = False, x = x_lat, y = y_lat, mode = 'markers', marker=dict(
+    lattice = lattice_trace(visible = False, x = x_lat, y = y_lat, mode = 'markers', marker=dict(
             color = 'Red',
             size = 10,
             )
@@ -497,8 +740,6 @@ def graphene(save = False):
     )
 
     # Setting axis to invisible
-    plot_range = N_points//3+0.3
-    shift = 1
     axis = dict(
             range=[-plot_range+shift, plot_range+shift],
             visible = False,
@@ -517,57 +758,36 @@ def graphene(save = False):
         yaxis = axis
     )
 
-    # Displaying the figure
-    fig = dict(data = data, layout = layout)
-    py.iplot(fig, filename = 'lattice_basics')
+    return dict(data = data, layout = layout)
 
-    if save:
-        # html file
-        py.plot(fig, filename='4-1-graphene.html')
+def graphene(save = False, N = 10, decimate = False):
+    # Displaying the figure and optionally the html file
+    render(build_graphene(N, decimate), '4-1-graphene.html' if save else None)
 
 ##################################################
 # ################      FCC       #################
 # #################################################       
 
-def FCC(save = False):
+@cached_figure
+def build_FCC():
     # Coordinates of the corner atoms
-    x = np.tile(np.arange(0,2,1),4)
-    y = np.repeat(np.arange(0,2,1),4)
-    z = np.tile(np.repeat(np.arange(0,2,1),2),2)
+    x, y, z = named_lattice('sc', 2, start = 0).T
 
     # Coordinates for the bcc lattice
     x_bcc = [.5,0,.5,1,.5,.5]
     y_bcc = [.5,.5,0,.5,1,.5]
     z_bcc = [0,.5,.5,.5,.5,1]
 
+    corners = np.column_stack([x, y, z])
+
     # creating edge lines
-    x_edges, y_edges, z_edges = [], [], []
-    for i in range(len(x)):
-        for j in range(i+1, len(x)):
-            vec_len = np.sqrt((x[j]-x[i])**2+(y[j]-y[i])**2+(z[j]-z[i])**2)
-            if vec_len < 1.1:
-                x_edges.extend([x[i], x[j], None])
-                y_edges.extend([y[i], y[j], None])
-                z_edges.extend([z[i], z[j], None])
+    x_edges, y_edges, z_edges = bonds(corners, 1.1)
 
     # Creating fcc lines
-    x_fcc, y_fcc, z_fcc = [], [], []
-    for j in range(len(x)):
-        vec_len = np.sqrt((x[j]-0.5)**2+(y[j]-0.5)**2+(z[j]-0.5)**2)
-        if vec_len < 1:
-            x_fcc.extend([x[j], 0.5, None])
-            y_fcc.extend([y[j], 0.5, None])
-            z_fcc.extend([z[j], 0.5, None])
+    x_fcc, y_fcc, z_fcc = bonds(corners, 1, others = [[0.5, 0.5, 0.5]])
 
     # Creating bcc lines
-    x_bcc_l, y_bcc_l, z_bcc_l = [], [], []
-    for j in range(len(x)):
-        for i in range(len(x_bcc)):
-            vec_len = np.sqrt((x[j]-x_bcc[i])**2+(y[j]-y_bcc[i])**2+(z[j]-z_bcc[i])**2)
-            if vec_len < 1:
-                x_bcc_l.extend([x_bcc[i], x[j], None])
-                y_bcc_l.extend([y_bcc[i], y[j], None])
-                z_bcc_l.extend([z_bcc[i], z[j], None])
+    x_bcc_l, y_bcc_l, z_bcc_l = bonds(corners, 1, others = np.column_stack([x_bcc, y_bcc, z_bcc]))
 
     # Initialize figure
     c_size = 32
@@ -723,21 +943,20 @@ def FCC(save = False):
 
     # Setting background to white
     fig.update_scenes(xaxis_visible = False, yaxis_visible = False,zaxis_visible = False )
-    fig.show();       
-    
-    if save:
-        # html file
-        py.plot(fig, filename='4-1-fcc.html')
-        
+    return fig
+
+def FCC(save = False):
+    # Displaying the figure and optionally the html file
+    render(build_FCC(), '4-1-fcc.html' if save else None)
 
 ##################################################
 # ################     filling    #################
 # #################################################   
 
-def filling(save = False):
+@cached_figure
+def build_filling():
     # Coordinates of the corner atoms
-    x = np.append(np.tile(np.arange(0,2,1),2), 0.5)
-    y = np.append(np.repeat(np.arange(0,2,1),2), 0.5)
+    x, y = np.append(named_lattice('square', 2, start = 0), [[0.5, 0.5]], axis = 0).T
 
     # lines
     x_line = [0, 0, 1, 1, 0]
@@ -858,22 +1077,20 @@ def filling(save = False):
         updatemenus = button_data,
         plot_bgcolor = 'rgba(0,0,0,0)'
     )
-    
-    if save:
-        # html file
-        py.plot(fig, filename='4-1-filling.html')
-    
-    fig.show();
+    return fig
+
+def filling(save = False):
+    # Displaying the figure and optionally the html file
+    render(build_filling(), '4-1-filling.html' if save else None)
 
 ##################################################
 # ################    diatomic    #################
 # #################################################        
 
-def diatomic(save = False):
+@cached_figure
+def build_diatomic():
         
-    x = np.tile(np.arange(0,2,1),4)
-    y = np.repeat(np.arange(0,2,1),4)
-    z = np.tile(np.repeat(np.arange(0,2,1),2),2)
+    x, y, z = named_lattice('sc', 2, start = 0).T
 
     trace1 = go.Scatter3d(
         x = x,
@@ -931,43 +1148,21 @@ def diatomic(save = False):
                         ))
 
 
-    fig=go.Figure(data=data, layout=layout)
-    py.iplot(fig, show_link=False)
+    return go.Figure(data=data, layout=layout)
 
-    if save:
-            # html file
-            py.plot(fig, filename='4-1-diatomic.html')
+def diatomic(save = False):
+    # Displaying the figure and optionally the html file
+    render(build_diatomic(), '4-1-diatomic.html' if save else None)
 
 ##################################################
 # ################    diamond     #################
 # #################################################        
 
-def diamond(save = False):
-    Xn = np.tile(np.arange(0,2,1),4)
-    Yn = np.repeat(np.arange(0,2,1),4)
-    Zn = np.tile(np.repeat(np.arange(0,2,1),2),2)
-
-    Xn = np.hstack((Xn, Xn, Xn+0.5, Xn+0.5))
-    Yn = np.hstack((Yn, Yn+0.5, Yn+0.5, Yn))
-    Zn = np.hstack((Zn, Zn+0.5, Zn, Zn+0.5))
-
-    Xn = np.hstack((Xn, Xn+1/4))
-    Yn = np.hstack((Yn, Yn+1/4))
-    Zn = np.hstack((Zn, Zn+1/4))
-
-    Xe=[]
-    Ye=[]
-    Ze=[]
-
-    num_atoms = len(Xn)
-    for i in range(num_atoms):
-        for j in np.arange(i+1, num_atoms, 1):
-            pos1 = np.array([Xn[i], Yn[i], Zn[i]])
-            pos2 = np.array([Xn[j], Yn[j], Zn[j]])
-            if np.linalg.norm(pos1-pos2) == np.sqrt(3)/4:
-                Xe+=[Xn[i], Xn[j], None]
-                Ye+=[Yn[i], Yn[j], None]  
-                Ze+=[Zn[i], Zn[j], None]  
+@cached_figure
+def build_diamond():
+    Xn, Yn, Zn = named_lattice('diamond_conventional', 2, start = 0).T
+
+    Xe, Ye, Ze = bonds(np.column_stack([Xn, Yn, Zn]), np.sqrt(3)/4 + BOND_TOL, r_min = np.sqrt(3)/4 - BOND_TOL)
 
     trace1=go.Scatter3d(x=Xe,
                    y=Ye,
@@ -1017,10 +1212,87 @@ def diamond(save = False):
 
     data=[trace1, trace2]
 
-    fig=go.Figure(data=data, layout=layout)
+    return go.Figure(data=data, layout=layout)
+
+def diamond(save = False):
+    # Displaying the figure and optionally the html file
+    render(build_diamond(), '4-1-diamond.html' if save else None)
+
+##################################################
+# ###########  real and reciprocal space  ##########
+# #################################################
+
+@cached_figure
+def build_reciprocal(N_values = 10, active = 4):
+    from plotly.subplots import make_subplots
+
+    # Define primitive lattice vectors
+    a1 = np.array([1,0])
+    a2 = np.array([0.5,np.sqrt(3)/2])
+    # Compute reciprocal lattice vectors
+    b1,b2 = np.linalg.inv(np.array([a1,a2]).T) @ np.eye(2)*2*np.pi
+    plot_range = 5
+
+    # The y axes are not shared: the slider gives the two panels different ranges
+    fig = make_subplots(rows=1, cols=2, subplot_titles=('Real Space', 'Reciprocal Space'))
+
+    # Both lattices are drawn once at unit lattice constant; the slider scales real space by the lattice
+    # constant and reciprocal space by its inverse
+    for (v1, v2), col in (((a1, a2), 1), ((b1, b2), 2)):
+        lat_points = lattice_generation(v1, v2, 6)
+        for line in ([[0,0],v1], [[0,0],v2]):
+            fig.add_trace(go.Scatter(x=np.transpose(line)[0], y=np.transpose(line)[1], mode='lines',
+                                     line_color='red'), row = 1, col = col)
+        for line in ([v1,v1+v2], [v2,v1+v2]):
+            fig.add_trace(go.Scatter(x=np.transpose(line)[0], y=np.transpose(line)[1], mode='lines',
+                                     line_color='red', line_dash='dot'), row = 1, col = col)
+        fig.add_trace(go.Scatter(x=lat_points.T[0], y=lat_points.T[1], mode='markers',
+                                 marker=dict(color='Black', size = 10)), row = 1, col = col)
+
+    axes = [('xaxis', 'yaxis', 1), ('xaxis2', 'yaxis2', -1)]
+    scales = np.linspace(2.5, 3.5, N_values)
+    active = min(active, len(scales) - 1) # the fifth step, or the last of a shorter slider
+    sliders = [scale_slider(axes, scales, plot_range, active, label = 'Lattice Constant',
+        tickcolor = 'White',
+        font_color = 'White',
+        currentvalue_font_color = 'Black',
+        name = 'Lattice Constant',
+    )]
+
+    fig.update_layout(
+        sliders=sliders,
+        showlegend = False,
+        plot_bgcolor = 'rgb(254, 254, 254)',
+        width = 800,
+        height = 400,
+    )
+    fig.update_xaxes(visible = False, showgrid = False)
+    fig.update_yaxes(visible = False, showgrid = False)
+    fig.update_yaxes(row=1, col=1, scaleanchor="x", scaleratio=1)
+    fig.update_yaxes(row=1, col=2, scaleanchor="x2", scaleratio=1)
+    # Initial ranges of the active step
+    fig.update_layout({k.replace('.range', ''): dict(range = r)
+                       for k, r in scaled_ranges(axes, scales[active], plot_range).items()})
+
+    return fig
 
-    py.iplot(fig, filename='Diamond')
+def reciprocal(save = False, N_values = 10):
+    # Displaying the figure and optionally the html file
+    render(build_reciprocal(N_values), '4-2-reciprocal.html' if save else None)
+
+##################################################
+# ##############  figure registry  ################
+# #################################################
 
-    if save:
-            # html file
-            py.plot(fig, filename='4-1-diamond.html')
+# The html export of every figure, used by build_figures.py
+FIGURES = {
+    '4-1-simple_lattice.html': build_simple_lattice,
+    '4-1-periodic.html': build_periodic,
+    '4-1-graphene-single.html': build_graphene_single,
+    '4-1-graphene.html': build_graphene,
+    '4-1-fcc.html': build_FCC,
+    '4-1-filling.html': build_filling,
+    '4-1-diatomic.html': build_diatomic,
+    '4-1-diamond.html': build_diamond,
+    '4-2-reciprocal.html': build_reciprocal,
+}
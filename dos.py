@@ -0,0 +1,174 @@
+#!/usr/bin/python
+
+"""
+dos.py: densities of states from band energies on k-grids, by the linear triangle method or Gaussian smearing
+"""
+
+from SSP import *
+
+CHUNK = 2**18 # number of grid points (over all bands) processed at a time
+BINS = 512 # default number of energy bins
+
+# Every function takes the band energies as an array whose last dim axes are the k-grid and whose leading
+# axes (if any) count the bands, e.g. (nbands, ny, nx) from bands.evaluate_grid (which may be a np.memmap)
+# or Graphene.ipynb's Z of shape (ny, nx). dim defaults to 2, or 1 for a 1D array; 1D grids use linear
+# segments instead of triangles. The grid is read chunk by chunk along its first k-axis, and the DOS is
+# normalised per k-point, so it integrates to the number of bands.
+
+def _as_bands(energies, dim = None):
+    # View of shape (nbands, *grid)
+    energies = energies if isinstance(energies, np.ndarray) else np.asarray(energies, dtype=float)
+    dim = min(energies.ndim, 2) if dim is None else dim
+    return energies.reshape((-1,) + energies.shape[energies.ndim - dim:])
+
+def _rows(energies, overlap = 0):
+    # Slices along the first k-axis of about CHUNK points each; consecutive slices share `overlap` rows
+    per_row = int(np.prod(energies.shape)) // energies.shape[1]
+    rows = max(1, CHUNK // per_row)
+    n = energies.shape[1]
+    for start in range(0, max(n - overlap, 1), rows):
+        yield slice(start, min(start + rows + overlap, n))
+
+def energy_range(energies, dim = None):
+    # Lowest and highest finite energy, read chunk by chunk
+    energies = _as_bands(energies, dim)
+    lo, hi = np.inf, -np.inf
+    for rows in _rows(energies):
+        chunk = np.asarray(energies[:, rows], dtype=float)
+        lo, hi = min(lo, np.nanmin(chunk)), max(hi, np.nanmax(chunk))
+    return lo, hi
+
+def _edges(energies, E, dim = None):
+    # Bin edges given as an array or as a number of bins spanning the bands
+    if np.ndim(E) == 0:
+        return np.linspace(*energy_range(energies, dim), int(E) + 1)
+    return np.asarray(E, dtype=float)
+
+######### Linear triangle method #########
+
+def _simplices(chunk):
+    # Corner energies (n, d+1) of the segments (1D) or of the two triangles of every grid square (2D)
+    if chunk.ndim == 2:
+        return np.stack([chunk[:, :-1], chunk[:, 1:]], axis=-1).reshape(-1, 2)
+    a, b = chunk[:, :-1, :-1], chunk[:, :-1, 1:]
+    c, d = chunk[:, 1:, :-1], chunk[:, 1:, 1:]
+    return np.concatenate([np.stack([a, b, c], axis=-1).reshape(-1, 3),
+                           np.stack([b, c, d], axis=-1).reshape(-1, 3)])
+
+def _fraction_below(e, E):
+    # Fraction of a linearly interpolated segment or triangle (sorted corner energies e) below E
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if e.shape[1] == 2:
+            f = (E - e[:, 0]) / (e[:, 1] - e[:, 0])
+        else:
+            e1, e2, e3 = e.T
+            f = np.where(E < e2, (E - e1)**2 / ((e2 - e1) * (e3 - e1)),
+                         1 - (e3 - E)**2 / ((e3 - e1) * (e3 - e2)))
+    return np.where(E <= e[:, 0], 0, np.where(E >= e[:, -1], 1, f))
+
+def triangle_counts(energies, edges, dim = None):
+
+    """
+    Number of states per energy bin from the linear interpolation of the bands between grid points
+
+    Input:
+    ---
+    energies: band grid, e.g. (nbands, ny, nx) or (ny, nx)
+    edges: energy bin edges
+    dim: number of k-axes at the end of energies (1 or 2)
+
+    Returns:
+    ---
+    The number of states in each bin, per k-point (summing to the number of bands if the bins span them)
+
+    """
+
+    energies = _as_bands(energies, dim)
+    edges = np.asarray(edges, dtype=float)
+    counts = np.zeros(len(edges) - 1)
+
+    for rows in _rows(energies, overlap = 1):
+        e = np.sort(_simplices(np.asarray(energies[:, rows], dtype=float)), axis=1)
+        e = e[~np.isnan(e).any(1)] # empty states, e.g. from bands.fill
+
+        # The same edge index serves every band: simplex s covers the bins between first[s] and last[s],
+        # and the change of its cumulative fraction across each of them goes into that bin
+        first = np.searchsorted(edges, e[:, 0], 'right')
+        last = np.minimum(np.searchsorted(edges, e[:, -1], 'right'), len(edges) - 1)
+        below = np.zeros(len(e))
+        for offset in range(int((last - first).max(initial = -1)) + 1):
+            active = np.flatnonzero(first + offset <= last)
+            m = first[active] + offset
+            fraction = _fraction_below(e[active], edges[m])
+            inside = m > 0 # the part below the first edge is dropped
+            counts += np.bincount(m[inside] - 1, (fraction - below[active])[inside], len(counts))
+            below[active] = fraction
+
+    # Each simplex holds an equal share of the states of its band
+    grid = energies.shape[1:]
+    return counts / (grid[0] - 1 if len(grid) == 1 else 2 * (grid[0] - 1) * (grid[1] - 1))
+
+def triangle_dos(energies, E = BINS, dim = None):
+
+    """
+    Density of states of a band grid by the linear triangle method (linear segments in 1D)
+
+    Input:
+    ---
+    energies: band grid, e.g. (nbands, ny, nx) or (ny, nx)
+    E: energy bin edges, or the number of bins spanning the bands
+    dim: number of k-axes at the end of energies (1 or 2)
+
+    Returns:
+    ---
+    The bin centres and the DOS g(E) in states per k-point per unit energy
+
+    """
+
+    edges = _edges(energies, E, dim)
+    return (edges[1:] + edges[:-1]) / 2, triangle_counts(energies, edges, dim) / np.diff(edges)
+
+######### Gaussian smearing #########
+
+def gaussian_dos(energies, E = BINS, sigma = None, dim = None):
+
+    """
+    Density of states of a band grid with every state broadened into a Gaussian
+
+    Input:
+    ---
+    energies: band grid, e.g. (nbands, ny, nx) or (ny, nx)
+    E: evenly spaced energies, or their number spanning the bands
+    sigma: standard deviation of the Gaussians (default: two energy steps)
+    dim: number of k-axes at the end of energies
+
+    Returns:
+    ---
+    The energies and the DOS g(E) in states per k-point per unit energy
+
+    """
+
+    energies = _as_bands(energies, dim)
+    E = np.linspace(*energy_range(energies), int(E)) if np.ndim(E) == 0 else np.asarray(E, dtype=float)
+    h = E[1] - E[0]
+    sigma = 2 * h if sigma is None else sigma
+
+    # Every state is shared linearly between its two neighbouring energies; the index and weights are
+    # computed once for all bands of a chunk
+    weights = np.zeros(len(E) + 1)
+    for rows in _rows(energies):
+        flat = np.asarray(energies[:, rows], dtype=float).ravel()
+        flat = flat[~np.isnan(flat)]
+        x = (flat - E[0]) / h
+        inside = (x >= 0) & (x <= len(E) - 1)
+        i = np.floor(x[inside]).astype(np.int64)
+        frac = x[inside] - i
+        weights += np.bincount(i, 1 - frac, len(E) + 1) + np.bincount(i + 1, frac, len(E) + 1)
+
+    # One convolution with the sampled Gaussian broadens every state at once
+    half = int(np.ceil(5 * sigma / h))
+    offsets = np.arange(-half, half + 1) * h
+    kernel = np.exp(-offsets**2 / (2 * sigma**2)) / (np.sqrt(2 * np.pi) * sigma)
+    g = np.convolve(weights[:len(E)], kernel, mode='same') if half < len(E) else \
+        np.convolve(weights[:len(E)], kernel, mode='full')[half:half + len(E)]
+    return E, g / np.prod(energies.shape[1:])
@@ -0,0 +1,134 @@
+#!/usr/bin/python
+
+"""
+drude.py: Drude-model random walks of many electrons keeping only running statistics
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+from SSP import *
+
+BLOCK = 32 # time steps whose random numbers are drawn at once
+WALKER_CHUNK = 2**17 # walkers advanced together inside one worker
+LAGS = 64 # number of time lags of the velocity autocorrelation
+SAMPLES = 1024 # largest number of times at which <v>, <r> and var_r are recorded by default
+
+def _simulate(walkers, steps, dt, tau, gamma, a, lags, burn, stride, seed):
+    # Advance `walkers` electrons, returning sums over walkers so workers can be combined; the moments are
+    # recorded every `stride` steps and the velocity past the transient is summed for the drift. The
+    # velocity autocorrelation keeps raw sums, its mean being the ensemble drift known only once combined
+    rng = np.random.default_rng(seed)
+    samples = -(-steps // stride)
+    sums = dict(
+        v = np.zeros((samples, 2)),
+        r = np.zeros((samples, 2)),
+        r2 = np.zeros((samples, 2)),
+        drift = np.zeros(2),
+        ov = np.zeros(lags), # sum of v(t0).v(t0 + lag)
+        o = np.zeros((lags, 2)), # sum of v(t0)
+        vl = np.zeros((lags, 2)), # sum of v(t0 + lag)
+        pairs = np.zeros(lags),
+    )
+
+    for first in range(0, walkers, WALKER_CHUNK):
+        w = min(WALKER_CHUNK, walkers - first)
+        v = np.zeros((2, w))
+        r = np.zeros((2, w))
+
+        for block in range(0, steps, BLOCK):
+            n = min(BLOCK, steps - block)
+            # Random scattering events and angles for the whole block
+            events = rng.random((n, w)) < dt/tau
+            angles = rng.uniform(high=2*np.pi, size=(n, w))
+
+            for i in range(n):
+                step = block + i
+                if step > 0:
+                    v[0] += a * dt
+                    s, c, sn = events[i], np.cos(angles[i]), np.sin(angles[i])
+                    v = np.array([
+                        np.where(s, c*v[0] + sn*v[1], v[0]),
+                        np.where(s, -sn*v[0] + c*v[1], v[1]),
+                    ]) * (1 - gamma * s)
+                r += v * dt
+
+                if step % stride == 0:
+                    sums['v'][step // stride] += v.sum(1)
+                    sums['r'][step // stride] += r.sum(1)
+                    sums['r2'][step // stride] += (r**2).sum(1)
+
+                # Velocity autocorrelation once past the transient, from time origins every `lags` steps
+                # so only one reference velocity is kept
+                if step >= burn:
+                    sums['drift'] += v.sum(1)
+                    lag = (step - burn) % lags
+                    if lag == 0:
+                        origin = v.copy()
+                    sums['ov'][lag] += (origin * v).sum()
+                    sums['o'][lag] += origin.sum(1)
+                    sums['vl'][lag] += v.sum(1)
+                    sums['pairs'][lag] += w
+
+    return sums
+
+def drude_simulate(walkers = 20, T = 25, dt = .05, tau = 1, gamma = .3, a = 1, lags = LAGS,
+                   t_burn = None, stride = None, seed = None, workers = 1):
+
+    """
+    Simulate the Drude model for many walkers in bounded memory
+
+    Input:
+    ---
+    walkers: number of particles
+    T: simulation time
+    dt: time step
+    tau: relaxation time
+    gamma: dissipation strength
+    a: acceleration along x
+    lags: number of time lags of the velocity autocorrelation
+    t_burn: time after which the steady state is averaged (default 5 tau, at most T/2)
+    stride: number of time steps between the recorded <v>, <r> and var_r (default: at most SAMPLES
+            records), so memory does not grow with T/dt
+    seed: seed of the numpy.random.SeedSequence that is split into one stream per worker
+    workers: number of worker processes
+
+    Returns:
+    ---
+    A dictionary with the recorded times t, the mean velocity and position <v>(t), <r>(t), the position
+    variance var_r(t), the steady-state drift velocity (averaged over every step), and the velocity
+    autocorrelation vacf of the fluctuations about that drift at times lag_t
+
+    """
+
+    steps = int(T // dt)
+    burn = min(int((5*tau if t_burn is None else t_burn) // dt), steps // 2) # keep half the run for statistics
+    lags = min(lags, max(steps - burn, 1))
+    stride = max(-(-steps // SAMPLES), 1) if stride is None else stride
+
+    # Independent random streams for every worker
+    streams = np.random.SeedSequence(seed).spawn(workers)
+    shares = np.diff(np.linspace(0, walkers, workers + 1).astype(int))
+    args = [(w, steps, dt, tau, gamma, a, lags, burn, stride, s) for w, s in zip(shares, streams)]
+
+    if workers == 1:
+        parts = [_simulate(*args[0])]
+    else:
+        with ProcessPoolExecutor(workers) as pool:
+            parts = list(pool.map(_simulate, *zip(*args)))
+    sums = {k: sum(p[k] for p in parts) for k in parts[0]}
+
+    mean_v = sums['v'] / walkers
+    mean_r = sums['r'] / walkers
+    # Autocorrelation of the fluctuations about the steady-state drift of the whole ensemble
+    drift = sums['drift'] / (walkers * max(steps - burn, 1))
+    pairs = np.maximum(sums['pairs'], 1)
+    vacf = (sums['ov'] - sums['o'] @ drift - sums['vl'] @ drift) / pairs + drift @ drift
+    return dict(
+        t = np.arange(0, steps, stride) * dt,
+        mean_v = mean_v,
+        mean_r = mean_r,
+        var_r = sums['r2'] / walkers - mean_r**2,
+        v_drift = drift,
+        lag_t = np.arange(lags) * dt,
+        vacf = vacf,
+    )
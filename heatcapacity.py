@@ -0,0 +1,364 @@
+#!/usr/bin/python
+
+"""
+heatcapacity.py: vectorised Einstein and Debye heat-capacity models for fitting measured C(T)
+"""
+
+import os
+import glob
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+
+from SSP import *
+
+######### Debye integral #########
+# The Debye integral I(u) = int_0^u y^4 e^y / (e^y - 1)^2 dy is evaluated with a fixed-order
+# Gauss-Legendre rule on [0, u] for u <= U_SPLIT, and from its large-u limit for u > U_SPLIT:
+#   I(u) = 4 pi^4 / 15 - sum_k k int_u^inf y^4 e^(-k y) dy
+# Against scipy.integrate.quad run at epsrel=1e-13 the absolute error in C/k_B is below 1e-14 for all T/T_D
+# (about 3e-15); quad at its default tolerances is itself only accurate to ~1e-10.
+GAUSS_ORDER = 32
+U_SPLIT = 20
+TAIL_TERMS = 3
+U_NO_TAIL = 100 # above this the tail is below 1e-30 and is dropped, so it cannot overflow
+U_CLASSICAL = 1e-4 # below this C = 3 (1 - u^2/20), exact to double precision, avoiding 0/0 as u^3 underflows
+I_INFINITY = 4 * np.pi**4 / 15
+BLOCK = 2**16 # number of temperatures evaluated at once, bounding the (BLOCK, GAUSS_ORDER) temporaries
+
+@lru_cache(maxsize=None)
+def _gauss_legendre(n):
+    # Nodes and weights mapped from [-1, 1] onto [0, 1]
+    nodes, weights = np.polynomial.legendre.leggauss(n)
+    return (nodes + 1) / 2, weights / 2
+
+def _integrand(y):
+    # y^4 e^y / (e^y - 1)^2 written in terms of e^(-y) so it cannot overflow
+    y = np.asarray(y, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        em = np.exp(-y)
+        f = y**4 * em / (-np.expm1(-y))**2
+    return np.where(y > 0, f, 0)
+
+def _tail(u):
+    # int_u^inf y^4 e^y/(e^y-1)^2 dy = sum_k k int_u^inf y^4 e^(-k y) dy
+    tail = np.zeros_like(u)
+    for k in range(1, TAIL_TERMS + 1):
+        ku = k * u
+        poly = ku**4 + 4*ku**3 + 12*ku**2 + 24*ku + 24
+        tail += k * np.exp(-ku) * poly / k**5
+    return tail
+
+def debye_integral(u):
+
+    """
+    Evaluate the Debye integral int_0^u y^4 e^y / (e^y - 1)^2 dy for an array of upper limits
+
+    Input:
+    ---
+    u: upper limit T_D/T (scalar or array, u >= 0, may be inf)
+
+    Returns:
+    ---
+    The integral, with the same shape as u
+
+    """
+
+    u = np.asarray(u, dtype=float)
+    flat = u.ravel()
+    out = np.empty_like(flat)
+    nodes, weights = _gauss_legendre(GAUSS_ORDER)
+
+    for start in range(0, flat.size, BLOCK):
+        ub = flat[start:start+BLOCK]
+        small = ub <= U_SPLIT
+        res = np.empty_like(ub)
+
+        # Quadrature for the finite range
+        us = ub[small]
+        res[small] = us * (_integrand(us[:, None] * nodes) @ weights)
+
+        # Asymptotic limit for the large range
+        ul = ub[~small]
+        res[~small] = I_INFINITY - np.where(ul > U_NO_TAIL, 0, _tail(np.minimum(ul, U_NO_TAIL)))
+        out[start:start+BLOCK] = res
+
+    return out.reshape(u.shape)
+
+######### Heat capacity models #########
+
+def c_einstein(T, w):
+
+    """
+    Calculate the specific heat capacity according to the Einstein model of a solid
+
+    Input:
+    ---
+    T: Temperature [K] (scalar or array)
+    w: Einstein frequency \\omega [rad.s^-1]
+
+    Returns:
+    ---
+    The heat capacity in units of k_B
+
+    """
+
+    T = np.asarray(T, dtype=float)
+    with np.errstate(divide='ignore', over='ignore', invalid='ignore'):
+        x = (hbar * w)/(T * kb) # scale the variable
+        c = 3 * x**2 * np.exp(-x) / np.expm1(-x)**2 # compute the heat capacity without overflow
+    return np.where(T > 0, np.nan_to_num(c), 0)
+
+def c_debye(T, T_D):
+
+    """
+    Calculate the specific heat capacity according to the Debye model of a solid
+
+    Input:
+    ---
+    T: Temperature [K] (scalar or array, T >= 0, may be inf)
+    T_D: Debye temperature [K]
+
+    Returns:
+    ---
+    The heat capacity in units of k_B, 0 at T = 0 and 3 at T = inf
+
+    """
+
+    T = np.asarray(T, dtype=float)
+    if np.any(T < 0):
+        raise ValueError("Temperatures must be non-negative")
+    with np.errstate(divide='ignore', over='ignore', invalid='ignore'):
+        u = T_D / T
+        # u^3 overflows to inf (C -> 0) at the lowest temperatures
+        c = 9 * debye_integral(u) / u**3
+        return np.where(u < U_CLASSICAL, 3 * (1 - u**2 / 20), c)
+
+def c_debye_dTD(T, T_D):
+
+    """
+    Analytic derivative of the Debye heat capacity with respect to the Debye temperature
+
+    Input:
+    ---
+    T: Temperature [K] (scalar or array)
+    T_D: Debye temperature [K]
+
+    Returns:
+    ---
+    dC/dT_D in units of k_B/K
+
+    """
+
+    T = np.asarray(T, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        u = np.where(T > 0, T_D / T, np.inf)
+        # C = 9 I(u)/u^3 with u = T_D/T, so dC/dT_D = (9/T) (I'(u)/u^3 - 3 I(u)/u^4)
+        d = 9 / T * (_integrand(u) / u**3 - 3 * debye_integral(u) / u**4)
+    return np.where(T > 0, np.nan_to_num(d), 0)
+
+def c_debye_jac(T, T_D):
+    # Jacobian in the (N, 1) layout expected by curve_fit(..., jac=c_debye_jac)
+    return c_debye_dTD(T, T_D).reshape(-1, 1)
+
+def c_cubic(T, a):
+    # Low-temperature limit of the Debye model, C = a T^3
+    return a * np.asarray(T, dtype=float)**3
+
+def fit_debye(T, C, T_D = 500, **kwargs):
+
+    """
+    Fit the Debye model to measured heat-capacity data using the analytic Jacobian
+
+    Input:
+    ---
+    T: Temperatures [K]
+    C: Heat capacity in units of k_B
+    T_D: Initial guess for the Debye temperature [K]
+    kwargs: passed on to curve_fit
+
+    Returns:
+    ---
+    The fitted Debye temperature and its variance
+
+    """
+
+    popt, pcov = curve_fit(c_debye, np.asarray(T, dtype=float), np.asarray(C, dtype=float), T_D, jac=c_debye_jac, **kwargs)
+    return popt[0], pcov[0, 0]
+
+######### Phonon density of states #########
+# Any phonon DOS per atom, as (bin edges, g) in arbitrary frequency units (e.g. from phonons.phonon_dos),
+# replaces the Debye spectrum. Its frequency scale is set by theta = hbar omega_max / k_B, the temperature
+# of its highest frequency, which plays the role of the Debye temperature.
+DOS_BLOCK = 2**22 # number of (temperature, frequency bin) pairs evaluated at once
+
+def phonon_thermodynamics(T, dos, theta):
+
+    """
+    Heat capacity, entropy, energy and free energy of the harmonic phonons of a density of states
+
+    Input:
+    ---
+    T: Temperature [K] (scalar or array)
+    dos: (bin edges, g) of a phonon DOS per atom
+    theta: hbar omega_max / k_B [K] of the highest frequency of the DOS
+
+    Returns:
+    ---
+    A dictionary of the heat capacity C and entropy S in units of k_B, and the energy U and free energy F
+    (both including the zero-point energy) in units of k_B K, per atom and with the shape of T
+
+    """
+
+    T = np.asarray(T, dtype=float)
+    edges, g = (np.asarray(x, dtype=float) for x in dos)
+    centres = (edges[1:] + edges[:-1]) / 2
+    # Modes per bin and their energies hbar omega / k_B [K]; unstable (imaginary) modes are left out
+    stable = centres > 0
+    modes = (g * np.diff(edges))[stable]
+    energy = theta * centres[stable] / edges[-1]
+
+    flat = T.ravel()
+    out = {key: np.empty(flat.shape) for key in ('C', 'S', 'U', 'F')}
+    step = max(1, DOS_BLOCK // len(modes))
+    for start in range(0, flat.size, step):
+        Tb = flat[start:start+step, None]
+        with np.errstate(divide='ignore', over='ignore', invalid='ignore'):
+            x = energy / Tb
+            empty = -np.expm1(-x) # 1 - e^-x, the only exponential needed
+            n = (1 - empty) / empty # Bose occupation
+            log_empty = np.log(empty)
+            weights = {
+                'C' : np.nan_to_num(x**2 * (1 - empty) / empty**2),
+                'S' : np.nan_to_num(x * n - log_empty),
+                'U' : energy * (n + .5),
+                'F' : energy / 2 + Tb * log_empty,
+            }
+        # Every quantity is the matrix product of its per-mode weights with the DOS
+        for key, w in weights.items():
+            out[key][start:start+step] = w @ modes
+    return {key: value.reshape(T.shape) for key, value in out.items()}
+
+def c_phonon(T, theta, dos):
+    # Heat capacity in units of k_B per atom of a phonon DOS scaled to theta = hbar omega_max / k_B
+    return phonon_thermodynamics(T, dos, theta)['C']
+
+def fit_phonon(T, C, dos, theta = 300, **kwargs):
+
+    """
+    Fit the frequency scale of a phonon DOS to measured heat-capacity data
+
+    Input:
+    ---
+    T: Temperatures [K]
+    C: Heat capacity in units of k_B
+    dos: (bin edges, g) of a phonon DOS per atom, e.g. from phonons.phonon_dos
+    theta: Initial guess for hbar omega_max / k_B [K]
+    kwargs: passed on to curve_fit
+
+    Returns:
+    ---
+    The fitted theta and its variance
+
+    """
+
+    popt, pcov = curve_fit(lambda T, theta: c_phonon(T, theta, dos), np.asarray(T, dtype=float),
+                           np.asarray(C, dtype=float), theta, **kwargs)
+    return popt[0], pcov[0, 0]
+
+######### Batch fitting #########
+
+T_CUBIC = 25 # only data below this temperature [K] is used for the cubic fit
+
+def load_heat_capacity(filename):
+    # Read a two-column csv with headers T and C, shaped like Heat_capacity_Ag.csv
+    data = np.genfromtxt(filename, delimiter=',', names=True)
+    return data['T'], data['C']
+
+def _fit(model, T, C, p0, **kwargs):
+    # Returns the parameter and its variance, or nan if the fit does not converge
+    try:
+        popt, pcov = curve_fit(model, T, C, p0, **kwargs)
+        return popt[0], pcov[0, 0]
+    except (RuntimeError, ValueError):
+        return np.nan, np.nan
+
+def fit_material(T, C, w_E = 1e13, T_D = 300, T_cubic = T_CUBIC):
+
+    """
+    Fit the Einstein, Debye and low-temperature cubic models to one heat-capacity curve
+
+    Input:
+    ---
+    T: Temperatures [K]
+    C: Heat capacity in units of k_B
+    w_E: Initial guess for the Einstein frequency [rad.s^-1]
+    T_D: Initial guess for the Debye temperature [K]
+    T_cubic: Upper temperature [K] of the data used for the cubic fit
+
+    Returns:
+    ---
+    A dictionary of the fitted parameters and their variances
+
+    """
+
+    T = np.asarray(T, dtype=float)
+    C = np.asarray(C, dtype=float)
+
+    # Fit the Einstein model in units of 1e12 rad/s so the parameter is of order one
+    w, var_w = _fit(lambda T, w: c_einstein(T, w*1e12), T, C, w_E/1e12)
+    theta, var_theta = _fit(c_debye, T, C, T_D, jac=c_debye_jac)
+    low = T < T_cubic
+    a, var_a = _fit(c_cubic, T[low], C[low], 1e-5) if low.sum() > 1 else (np.nan, np.nan)
+
+    return {
+        'omega_E' : w*1e12,
+        'var_omega_E' : var_w*1e24,
+        'theta_D' : theta,
+        'var_theta_D' : var_theta,
+        'a_cubic' : a,
+        'var_a_cubic' : var_a,
+        # The Debye temperature implied by the low-temperature limit, C = 12 pi^4 / 5 (T/T_D)^3
+        'theta_D_cubic' : (12*np.pi**4/(5*a))**(1/3) if a > 0 else np.nan,
+        'n_points' : T.size,
+    }
+
+def _fit_item(item):
+    # A file that cannot be read gives a row without fits holding the error, so one bad file does not stop a batch
+    name, data = item
+    try:
+        T, C = load_heat_capacity(data) if isinstance(data, str) else data
+    except (OSError, ValueError, IndexError) as error:
+        return dict(material = name, **fit_material([], []), error = f'{type(error).__name__}: {error}')
+    return dict(material = name, **fit_material(T, C), error = None)
+
+def fit_materials(datasets, processes = None, chunksize = 4):
+
+    """
+    Fit the heat-capacity models to many materials over a process pool
+
+    Input:
+    ---
+    datasets: a directory of csv files, a list of csv files, or a dictionary {name: (T, C)}
+    processes: number of worker processes (None uses every core, 1 runs serially)
+    chunksize: number of materials handed to a worker at a time
+
+    Returns:
+    ---
+    A pandas DataFrame with one row per material; the fits of a file that cannot be read are nan and
+    its 'error' column holds the reason
+
+    """
+
+    if isinstance(datasets, str):
+        datasets = sorted(glob.glob(os.path.join(datasets, '*.csv')))
+    if not isinstance(datasets, dict):
+        datasets = {os.path.splitext(os.path.basename(f))[0]: f for f in datasets}
+    items = list(datasets.items())
+
+    if processes == 1 or len(items) < 2:
+        rows = list(map(_fit_item, items))
+    else:
+        with ProcessPoolExecutor(processes) as pool:
+            rows = list(pool.map(_fit_item, items, chunksize = chunksize))
+
+    return pd.DataFrame(rows).set_index('material')
@@ -0,0 +1,268 @@
+#!/usr/bin/python
+
+"""
+phonons.py: phonon dispersions of ball-and-spring models on the lattices of crystal.py
+"""
+
+import os
+import hashlib
+
+from SSP import *
+from tightbinding import SHELL_TOL, _lattice, hopping_terms, neighbour_hoppings
+
+CHUNK = 2**14 # number of k-points whose dynamical matrices are built and diagonalised at a time
+
+# A model is a lattice (a name in crystal.LATTICES or a (vectors, basis) pair), the masses of its basis
+# atoms and a spring list, a dictionary of arrays i, j, R, kappa: a spring between basis atom i in cell 0
+# and basis atom j in cell R, listed from both ends. The springs are central: a spring of constant kappa
+# along the unit vector e only resists stretching, with the force constant matrix kappa e e^T, so
+# chains recover the closed forms of 3-1, 3-2 and Assignment05.
+
+def _springs(hoppings):
+    # Spring list from a hopping list of tightbinding.py, whose hoppings are the spring constants
+    return dict(i = hoppings['i'], j = hoppings['j'], R = hoppings['R'], kappa = np.real(hoppings['t']))
+
+def spring_terms(terms):
+
+    """
+    Spring list from explicitly written springs
+
+    Input:
+    ---
+    terms: list of (i, j, R, kappa), once per spring: basis atoms i and j, the cell R of atom j
+           (an integer or a sequence of integers) and the spring constant kappa
+
+    Returns:
+    ---
+    The spring list, a dictionary of the arrays i, j, R, kappa
+
+    """
+
+    return _springs(hopping_terms(terms))
+
+def neighbour_springs(lattice, kappa = 1):
+
+    """
+    Spring list of a lattice with springs to the first few neighbour shells
+
+    Input:
+    ---
+    lattice: name in crystal.LATTICES or a (vectors, basis) pair
+    kappa: spring constant to the nearest neighbours, or a sequence (kappa1, kappa2, ...) for successive
+           shells, e.g. (kappa1, kappa2) for the next-nearest-neighbour chain of Assignment05
+
+    Returns:
+    ---
+    The spring list, a dictionary of the arrays i, j, R, kappa
+
+    """
+
+    return _springs(neighbour_hoppings(lattice, kappa))
+
+def chain_model(kappa, a = 1):
+
+    """
+    A chain whose unit cell of length a holds len(kappa) evenly spaced atoms joined by springs in turn
+
+    Input:
+    ---
+    kappa: spring constants along the cell, e.g. (k1, k2) for the chain of 3-2-diatomic
+    a: lattice constant
+
+    Returns:
+    ---
+    The lattice, a (vectors, basis) pair, and the spring list
+
+    """
+
+    nb = len(kappa)
+    lattice = (np.array([[a]]), np.arange(nb)[:, None] * a / nb)
+    # Spring s joins atom s to atom s + 1, the last one to the first atom of the next cell
+    return lattice, spring_terms([(s, (s + 1) % nb, (s + 1) // nb, k) for s, k in enumerate(kappa)])
+
+######### Dynamical matrices #########
+
+def _kpoints(k, dim):
+    # k-points as an array of shape (..., dim), any shape being allowed in 1D
+    k = np.asarray(k, dtype=float)
+    if dim == 1 and (k.ndim == 0 or k.shape[-1] != 1):
+        k = k[..., None]
+    return k
+
+def _force_constants(lattice, springs, masses):
+    # Bond vectors d and the mass-weighted force constants of every spring, flattened into the (i alpha, j beta)
+    # elements of D, and the k-independent restoring term on the diagonal blocks
+    vectors, basis = _lattice(lattice)
+    dim, nb = vectors.shape[1], len(basis)
+    n = nb * dim
+    i, j, kappa = springs['i'], springs['j'], springs['kappa']
+    d = springs['R'] @ vectors + basis[j] - basis[i]
+    e = d / np.linalg.norm(d, axis=1)[:, None]
+    C = kappa[:, None, None] * e[:, :, None] * e[:, None, :]
+
+    alpha, beta = np.meshgrid(np.arange(dim), np.arange(dim), indexing='ij')
+    row = i[:, None, None] * dim + alpha
+    coupling = np.zeros((len(d), n * n))
+    np.add.at(coupling, (np.arange(len(d))[:, None, None], row * n + j[:, None, None] * dim + beta), C)
+    restoring = np.zeros(n * n)
+    np.add.at(restoring, row * n + i[:, None, None] * dim + beta, C)
+
+    m = np.repeat(np.broadcast_to(np.asarray(masses, dtype=float), (nb,)), dim)
+    weight = 1 / np.sqrt(np.outer(m, m)).ravel()
+    return d, coupling * weight, restoring * weight
+
+def _centrosymmetric(d, coupling):
+    # Whether the springs along d and -d add the same elements, so that the sin(k.d) parts cancel and D(k) is real
+    key = np.round(d / SHELL_TOL).astype(np.int64)
+    unique, inverse = np.unique(key, axis=0, return_inverse=True)
+    total = np.zeros((len(unique), coupling.shape[1]))
+    np.add.at(total, inverse.ravel(), coupling)
+    lookup = {tuple(u): t for u, t in zip(unique, total)}
+    return all(tuple(-u) in lookup and np.allclose(lookup[tuple(-u)], t) for u, t in zip(unique, total))
+
+def dynamical_matrix(k, lattice, springs, masses = 1):
+
+    """
+    Dynamical matrices D(k) of a spring model for every k-point at once
+
+    Input:
+    ---
+    k: k-points, array of shape (..., dim), or of any shape in 1D
+    lattice: name in crystal.LATTICES or a (vectors, basis) pair
+    springs: spring list (see spring_terms, neighbour_springs and chain_model)
+    masses: mass of the atoms, scalar or one per basis atom
+
+    Returns:
+    ---
+    An array of shape (..., nb dim, nb dim), nb the number of basis atoms, indexed by (atom, direction);
+    real when every spring has a partner along the opposite bond, complex otherwise
+
+    """
+
+    vectors, _ = _lattice(lattice)
+    dim = vectors.shape[1]
+    k = _kpoints(k, dim)
+    shape = k.shape[:-1]
+    d, coupling, restoring = _force_constants(lattice, springs, masses)
+
+    # D_{i alpha, j beta}(k) = (delta_ij sum_j' C_ij' - sum C_ij e^{i k.d}) / sqrt(m_i m_j) over the springs;
+    # like tightbinding.bloch_hamiltonian every spring is sent to its elements by one matmul
+    phase = k.reshape(-1, dim) @ d.T
+    if _centrosymmetric(d, coupling):
+        D = restoring - np.cos(phase) @ coupling
+    else:
+        D = restoring - np.exp(1j * phase) @ coupling
+    n = int(np.sqrt(len(restoring)))
+    return D.reshape(shape + (n, n))
+
+def phonon_frequencies(k, lattice, springs, masses = 1, eigenvectors = False, chunk = CHUNK):
+
+    """
+    Phonon dispersion of a spring model: the frequencies of all branches at every k-point
+
+    Input:
+    ---
+    k: k-points, array of shape (..., dim), or of any shape in 1D
+    lattice: name in crystal.LATTICES or a (vectors, basis) pair
+    springs: spring list (see spring_terms, neighbour_springs and chain_model)
+    masses: mass of the atoms, scalar or one per basis atom
+    eigenvectors: True also returns the polarisations
+    chunk: number of k-points diagonalised at a time
+
+    Returns:
+    ---
+    The frequencies omega, of shape (..., nb dim) and in ascending order along the last axis (acoustic
+    branches first), unstable modes (omega^2 < 0) as negative frequencies; with eigenvectors the
+    polarisations (..., nb dim, nb dim), the columns belonging to the frequencies
+
+    """
+
+    vectors, _ = _lattice(lattice)
+    k = _kpoints(k, vectors.shape[1])
+    shape = k.shape[:-1]
+    k = k.reshape(-1, k.shape[-1])
+
+    omega, modes = [], []
+    for start in range(0, len(k), chunk):
+        D = dynamical_matrix(k[start:start+chunk], lattice, springs, masses)
+        if eigenvectors:
+            w2, v = np.linalg.eigh(D)
+            modes.append(v)
+        else:
+            w2 = np.linalg.eigvalsh(D)
+        omega.append(np.sign(w2) * np.sqrt(np.abs(w2)))
+
+    omega = np.concatenate(omega)
+    omega = omega.reshape(shape + omega.shape[-1:])
+    if eigenvectors:
+        modes = np.concatenate(modes)
+        return omega, modes.reshape(shape + modes.shape[-2:])
+    return omega
+
+######### Density of states #########
+# The DOS of a model is sampled on a uniform grid over the reciprocal cell (equivalent to the first zone by
+# periodicity) and stored as .npz under CACHE_DIR, keyed on the model and the sampling, so temperature
+# sweeps and fits reuse it
+
+GRID = 48 # k-points along each reciprocal vector
+BINS = 256 # number of frequency bins
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.phonon_cache')
+
+def _dos_key(lattice, springs, masses, N, bins):
+    vectors, basis = _lattice(lattice)
+    digest = hashlib.sha256()
+    for array in (vectors, basis, springs['i'], springs['j'], springs['R'], springs['kappa'], masses, N, bins):
+        array = np.asarray(array)
+        digest.update(str((array.dtype, array.shape)).encode())
+        digest.update(array.tobytes())
+    return digest.hexdigest()[:24]
+
+def sample_grid(lattice, N = GRID):
+    # Uniform k-points (N^dim, dim) over the reciprocal cell, offset by half a step so Gamma is avoided
+    vectors, _ = _lattice(lattice)
+    dim = len(vectors)
+    steps = (np.arange(N) + .5) / N - .5
+    grid = np.stack(np.meshgrid(*[steps] * dim, indexing='ij'), axis=-1).reshape(-1, dim)
+    return grid @ (2 * np.pi * np.linalg.inv(vectors).T)
+
+def phonon_dos(lattice, springs, masses = 1, N = GRID, bins = BINS, cache = True):
+
+    """
+    Phonon density of states of a spring model, histogrammed from the dispersion on a k-grid
+
+    Input:
+    ---
+    lattice: name in crystal.LATTICES or a (vectors, basis) pair
+    springs: spring list (see spring_terms, neighbour_springs and chain_model)
+    masses: mass of the atoms, scalar or one per basis atom
+    N: number of k-points along each reciprocal vector
+    bins: number of frequency bins
+    cache: False neither reads nor writes the copy kept on disk
+
+    Returns:
+    ---
+    The bin edges in the frequency units of the model and the DOS g(omega) per atom, which integrates
+    to the number of directions (3 in 3D)
+
+    """
+
+    path = os.path.join(CACHE_DIR, _dos_key(lattice, springs, masses, N, bins) + '.npz')
+    if cache and os.path.exists(path):
+        with np.load(path) as stored:
+            return stored['edges'], stored['g']
+
+    _, basis = _lattice(lattice)
+    omega = phonon_frequencies(sample_grid(lattice, N), lattice, springs, masses)
+    counts, edges = np.histogram(omega, bins, range = (min(omega.min(), 0), omega.max()))
+    g = counts / (len(omega) * len(basis) * np.diff(edges))
+
+    if cache:
+        # Written to a temporary file first so concurrent readers never see a partial file
+        try:
+            os.makedirs(CACHE_DIR, exist_ok = True)
+            tmp = f'{path[:-4]}.{os.getpid()}.tmp.npz'
+            np.savez(tmp, edges = edges, g = g)
+            os.replace(tmp, path)
+        except OSError:
+            pass # the cache is an optimisation only
+    return edges, g
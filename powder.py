@@ -0,0 +1,215 @@
+#!/usr/bin/python
+
+"""
+powder.py: automatic indexing of cubic powder-diffraction patterns (peaks -> d-spacings -> hkl -> lattice constant)
+"""
+
+import os
+import glob
+import itertools
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+
+from SSP import *
+
+N_MAX = 100 # largest h^2 + k^2 + l^2 in the lookup tables
+FIRST_PEAKS = 6 # number of allowed reflections tried as the assignment of the first peak
+STRUCTURES = ('SC', 'BCC', 'FCC', 'diamond')
+
+######### Selection rules #########
+
+def allowed(h, k, l, structure):
+    # Whether the structure factor of the conventional cubic cell is non-zero for (hkl)
+    h, k, l = np.asarray(h), np.asarray(k), np.asarray(l)
+    if structure == 'SC':
+        return np.ones(np.broadcast(h, k, l).shape, dtype=bool)
+    if structure == 'BCC':
+        return (h + k + l) % 2 == 0
+    unmixed = (h % 2 == k % 2) & (k % 2 == l % 2)
+    if structure == 'FCC':
+        return unmixed
+    if structure == 'diamond':
+        return unmixed & ((h % 2 == 1) | ((h + k + l) % 4 == 0))
+    raise ValueError(f"Unknown structure '{structure}', expected one of {STRUCTURES}")
+
+@lru_cache(maxsize=None)
+def reflections(structure, N_max = N_MAX):
+
+    """
+    Lookup table of the allowed reflections of a cubic structure
+
+    Input:
+    ---
+    structure: 'SC', 'BCC', 'FCC' or 'diamond'
+    N_max: largest h^2 + k^2 + l^2 included
+
+    Returns:
+    ---
+    A tuple (N, hkl, M): the allowed values of N = h^2 + k^2 + l^2 in ascending order, a representative
+    (hkl) with h >= k >= l >= 0 for each, and the multiplicity of each N
+
+    """
+
+    n = int(np.sqrt(N_max))
+    hkl = np.array(list(itertools.product(range(-n, n+1), repeat=3)))
+    hkl = hkl[allowed(*hkl.T, structure)]
+    N = (hkl**2).sum(1)
+    keep = (N > 0) & (N <= N_max)
+    hkl, N = hkl[keep], N[keep]
+
+    values, multiplicity = np.unique(N, return_counts=True)
+    # Representative indices: the largest |h| >= |k| >= |l| triple with that N
+    rep = np.sort(np.abs(hkl), axis=1)[:, ::-1]
+    order = np.lexsort((-rep[:, 2], -rep[:, 1], -rep[:, 0], N))
+    first = np.searchsorted(N[order], values)
+    return values, rep[order][first], multiplicity
+
+######### Indexing #########
+
+def wavelength(momenergy):
+    # Wavelength [m] from mv^2/beta [eV] as in Powder.ipynb
+    return const.h * const.c / (momenergy * e)
+
+def d_spacing(two_theta, wl):
+    # Plane spacing [m] from the Bragg condition, angles in degrees
+    return wl / (2 * np.sin(np.deg2rad(np.asarray(two_theta, dtype=float))/2))
+
+def _assign(d, a, N_allowed):
+    # Nearest allowed N for every peak, for a batch of lattice constants a (shape (n_a,))
+    N_est = (a[:, None] / d[None, :])**2
+    i = np.clip(np.searchsorted(N_allowed, N_est), 1, len(N_allowed) - 1)
+    lower, upper = N_allowed[i-1], N_allowed[i]
+    return np.where(N_est - lower < upper - N_est, lower, upper)
+
+def index_cubic(d, structures = STRUCTURES, d_range = None, N_max = N_MAX):
+
+    """
+    Find the cubic structure, Miller indices and lattice constant that best explain a set of d-spacings
+
+    Input:
+    ---
+    d: plane spacings of the observed peaks [m]
+    structures: candidate structures
+    d_range: (d_min, d_max) covered by the measurement, used to count allowed reflections that
+             are missing from the pattern (default: the range of d)
+    N_max: smallest table of h^2 + k^2 + l^2 considered (extended as needed to reach d_min)
+
+    Returns:
+    ---
+    A dictionary with the structure, lattice constant a, its standard error, the rms relative
+    error of the d-spacings, the number of missing reflections, and a per-peak DataFrame
+
+    """
+
+    d = np.sort(np.asarray(d, dtype=float))[::-1]
+    d_min, d_max = (d.min(), d.max()) if d_range is None else d_range
+    best = None
+
+    for structure in structures:
+        # The table has to reach the smallest d for every trial lattice constant
+        N_first = reflections(structure)[0][FIRST_PEAKS-1]
+        N_needed = max(N_max, int(np.ceil(1.1 * N_first * (d[0] / d_min)**2)))
+        N_allowed, hkl, M = reflections(structure, N_needed)
+
+        # Trial lattice constants: the first peak assigned to each of the first few allowed reflections
+        a_trial = d[0] * np.sqrt(N_allowed[:FIRST_PEAKS])
+        N = _assign(d, a_trial, N_allowed)
+
+        # Least-squares lattice constant for each assignment: minimise sum (d - a/sqrt(N))^2
+        w = 1 / np.sqrt(N)
+        a = (d * w).sum(1) / (w**2).sum(1)
+        rms = np.sqrt((((d - a[:, None] * w) / d)**2).mean(1))
+
+        # Allowed reflections inside the measured range that were not observed
+        d_allowed = a[:, None] / np.sqrt(N_allowed)[None, :]
+        in_range = (d_allowed >= d_min * (1 - 1e-3)) & (d_allowed <= d_max * (1 + 1e-3))
+        observed = (N_allowed[None, :, None] == N[:, None, :]).any(-1)
+        missing = (in_range & ~observed).sum(1)
+
+        # Each unexplained reflection counts against the fit; a coarse assignment must not win on rms alone
+        score = rms * (1 + missing)
+        j = np.argmin(score)
+        if best is None or score[j] < best['score']:
+            index = np.searchsorted(N_allowed, N[j])
+            sigma = np.sqrt(((d - a[j] * w[j])**2).sum() / max(len(d) - 1, 1) / (w[j]**2).sum())
+            best = dict(structure = structure, a = a[j], a_err = sigma, rms = rms[j], missing = missing[j],
+                        score = score[j], peaks = pd.DataFrame({
+                            'd' : d,
+                            'N' : N[j],
+                            '(hkl)' : [tuple(x) for x in hkl[index]],
+                            'M' : M[index],
+                        }, index = np.arange(1, len(d) + 1)))
+    return best
+
+def find_pattern_peaks(angle, intensity, prominence = 0.01):
+    # Peak positions [2 theta, degrees] of a pattern normalised to its maximum
+    peaks, _ = find_peaks(np.asarray(intensity) / np.max(intensity), prominence = prominence)
+    return np.asarray(angle)[peaks]
+
+def index_pattern(filename, momenergy, prominence = 0.01, structures = STRUCTURES):
+
+    """
+    Index a two-column .x_y powder pattern
+
+    Input:
+    ---
+    filename: path of the .x_y file (angle [2 theta, degrees], intensity)
+    momenergy: mv^2/beta of the probe particles [eV]
+    prominence: peak prominence relative to the strongest peak
+    structures: candidate structures
+
+    Returns:
+    ---
+    The dictionary returned by index_cubic, with the file name and peak angles added
+
+    """
+
+    angle, intensity = load_xy(filename).T
+    two_theta = find_pattern_peaks(angle, intensity, prominence)
+    wl = wavelength(momenergy)
+    d_range = tuple(np.sort(d_spacing([angle.max(), angle.min()], wl)))
+    result = index_cubic(d_spacing(two_theta, wl), structures, d_range)
+    result['peaks'].insert(0, '2theta', np.sort(two_theta))
+    result['file'] = filename
+    return result
+
+def _index_item(args):
+    filename, momenergy, prominence = args
+    try:
+        result = index_pattern(filename, momenergy, prominence)
+        result.pop('peaks')
+        return result
+    except ValueError as err:
+        return dict(file = filename, error = str(err))
+
+def index_patterns(patterns, momenergy, prominence = 0.01, processes = None, chunksize = 8):
+
+    """
+    Index many powder patterns over a process pool
+
+    Input:
+    ---
+    patterns: a directory of .x_y files or a list of file names
+    momenergy: mv^2/beta [eV], a single value or a dictionary {file name: value}
+    prominence: peak prominence relative to the strongest peak
+    processes: number of worker processes (None uses every core, 1 runs serially)
+    chunksize: number of patterns handed to a worker at a time
+
+    Returns:
+    ---
+    A pandas DataFrame with one row per pattern
+
+    """
+
+    if isinstance(patterns, str):
+        patterns = sorted(glob.glob(os.path.join(patterns, '*.x_y')))
+    energies = momenergy if isinstance(momenergy, dict) else dict.fromkeys(patterns, momenergy)
+    items = [(f, energies[f], prominence) for f in patterns]
+
+    if processes == 1 or len(items) < 2:
+        rows = list(map(_index_item, items))
+    else:
+        with ProcessPoolExecutor(processes) as pool:
+            rows = list(pool.map(_index_item, items, chunksize = chunksize))
+
+    return pd.DataFrame(rows).set_index('file')
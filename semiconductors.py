@@ -0,0 +1,190 @@
+#!/usr/bin/python
+
+"""
+semiconductors.py: carrier densities and the charge-neutral Fermi level of doped semiconductors
+"""
+
+from functools import lru_cache
+
+from SSP import *
+
+# Band parameters of 6-1-semiconductors and 6-2-doping, whose plots use kT = 1/2 (n_F = 1/(exp(2(E - E_F)) + 1))
+E_C, E_V = 1.8, -1.2
+E_D, E_A = E_C - .7, E_V + .5
+M_E, M_H = .5, 1 # electron and hole density-of-states prefactors (m_e, m_h in the notebooks)
+
+######### Fermi-Dirac integral #########
+# F_1/2(eta) = 2/sqrt(pi) int_0^inf sqrt(x) / (exp(x - eta) + 1) dx is tabulated once (as its logarithm, with
+# the derivative F_-1/2 = dF_1/2/deta) for ETA_MIN <= eta <= ETA_MAX; outside it the non-degenerate series and
+# the Sommerfeld expansion are used. The relative error is below 1e-7 everywhere.
+ETA_MIN, ETA_MAX = -20, 60
+ETA_STEP = 2e-3
+GAUSS_ORDER = 48
+
+@lru_cache(maxsize=None)
+def _table():
+    eta = np.arange(ETA_MIN, ETA_MAX + ETA_STEP/2, ETA_STEP)
+    # With x = u^2 the integrand 2u^2 / (exp(u^2 - eta) + 1) is smooth; the Fermi edge at u = sqrt(eta)
+    # splits the range into two Gauss-Legendre panels
+    nodes, weights = np.polynomial.legendre.leggauss(GAUSS_ORDER)
+    nodes, weights = (nodes + 1) / 2, weights / 2
+    edge = np.sqrt(np.maximum(eta, 0))[:, None]
+    end = np.sqrt(np.maximum(eta, 0) + 60)[:, None]
+    total = 0
+    for lo, hi in ((0, edge), (edge, end)):
+        u = lo + (hi - lo) * nodes
+        with np.errstate(over='ignore'):
+            f = 2 * u**2 * np.exp(-np.logaddexp(0, u**2 - eta[:, None]))
+        total = total + (hi - lo)[:, 0] * (f @ weights)
+    log_F = np.log(2 / np.sqrt(np.pi) * total)
+    return eta, log_F, np.gradient(log_F, ETA_STEP)
+
+def _log_fermi_dirac_half(eta):
+    # log F_1/2(eta) and its derivative, finite for any eta
+    eta = np.asarray(eta, dtype=float)
+    table, log_F, slope = _table()
+    low, high = eta < ETA_MIN, eta > ETA_MAX
+
+    log = np.interp(eta, table, log_F)
+    dlog = np.interp(eta, table, slope)
+    # Non-degenerate series F = e^eta (1 - e^eta / 2^(3/2))
+    z = np.exp(np.where(low, eta, ETA_MIN))
+    log = np.where(low, eta + np.log1p(-z / 2**1.5), log)
+    dlog = np.where(low, 1 - z / (2**1.5 - z), dlog)
+    # Degenerate (Sommerfeld) limit F = 4/(3 sqrt(pi)) eta^(3/2) (1 + pi^2 / (8 eta^2))
+    big = np.where(high, eta, ETA_MAX)
+    log = np.where(high, np.log(4 / (3 * np.sqrt(np.pi))) + 1.5 * np.log(big) + np.log1p(np.pi**2 / (8 * big**2)), log)
+    dlog = np.where(high, 1.5 / big - np.pi**2 / (4 * big**3 * (1 + np.pi**2 / (8 * big**2))), dlog)
+    return log, dlog
+
+def fermi_dirac_half(eta, derivative = False):
+
+    """
+    The complete Fermi-Dirac integral F_1/2, normalised so that F_1/2(eta) -> exp(eta) for eta -> -inf
+
+    Input:
+    ---
+    eta: reduced chemical potential, e.g. (E_F - E_C)/kT (scalar or array)
+    derivative: True also returns dF_1/2/deta = F_-1/2
+
+    Returns:
+    ---
+    F_1/2(eta), with the same shape as eta (and its derivative)
+
+    """
+
+    log, dlog = _log_fermi_dirac_half(eta)
+    F = np.exp(log)
+    return (F, F * dlog) if derivative else F
+
+######### Carrier densities #########
+
+def carrier_densities(E_F, kT, N_D = 0, N_A = 0, E_C = E_C, E_V = E_V, E_D = E_D, E_A = E_A,
+                      m_e = M_E, m_h = M_H, g_D = 1, g_A = 1):
+
+    """
+    Electron, hole and ionised impurity densities for the densities of states of 6-1 and 6-2,
+    g_e = m_e sqrt(E - E_C), g_h = m_h sqrt(E_V - E), and sharp donor and acceptor levels
+
+    Input:
+    ---
+    E_F: Fermi level (broadcastable array)
+    kT: temperature in energy units (broadcastable array)
+    N_D, N_A: donor and acceptor densities (broadcastable arrays)
+    E_C, E_V: conduction band bottom and valence band top
+    E_D, E_A: donor and acceptor levels
+    m_e, m_h: prefactors of the electron and hole densities of states
+    g_D, g_A: degeneracies of the impurity levels (1 occupies them with the plain Fermi function as in 6-2)
+
+    Returns:
+    ---
+    A dictionary of n, p, the ionised donors N_D+ and the ionised acceptors N_A-
+
+    """
+
+    kT = np.asarray(kT, dtype=float)
+    # int_0^inf sqrt(x) f(x) dx = sqrt(pi)/2 kT^(3/2) F_1/2
+    scale = np.sqrt(np.pi) / 2 * kT**1.5
+    with np.errstate(over='ignore'):
+        return {
+            'n' : m_e * scale * fermi_dirac_half((E_F - E_C) / kT),
+            'p' : m_h * scale * fermi_dirac_half((E_V - E_F) / kT),
+            'N_D+' : N_D / (1 + g_D * np.exp((E_F - E_D) / kT)),
+            'N_A-' : N_A / (1 + g_A * np.exp((E_A - E_F) / kT)),
+        }
+
+def _log_ratio(E_F, kT, N_D, N_A, E_C, E_V, E_D, E_A, m_e, m_h, g_D, g_A):
+    # log((n + N_A-) / (p + N_D+)), increasing in E_F and zero at neutrality, and its derivative. Every
+    # density is formed from its logarithm and the ionised fractions directly, as 1 - f cancels at low kT
+    log_scale = np.log(np.sqrt(np.pi) / 2) + 1.5 * np.log(kT)
+    log_e, dlog_e = _log_fermi_dirac_half((E_F - E_C) / kT)
+    log_h, dlog_h = _log_fermi_dirac_half((E_V - E_F) / kT)
+    ionised_D = np.exp(-np.logaddexp(0, (E_F - E_D) / kT + np.log(g_D)))
+    ionised_A = np.exp(-np.logaddexp(0, (E_A - E_F) / kT + np.log(g_A)))
+    with np.errstate(divide='ignore'):
+        terms = [(np.log(m_e) + log_scale + log_e, dlog_e / kT), (np.log(N_A * ionised_A), (1 - ionised_A) / kT),
+                 (np.log(m_h) + log_scale + log_h, -dlog_h / kT), (np.log(N_D * ionised_D), -(1 - ionised_D) / kT)]
+
+    ratio, slope = 0, 0
+    for sign, ((log_a, d_a), (log_b, d_b)) in ((1, terms[:2]), (-1, terms[2:])):
+        log_sum = np.logaddexp(log_a, log_b)
+        w = np.exp(log_a - log_sum) # share of the first term
+        ratio = ratio + sign * log_sum
+        slope = slope + sign * (w * d_a + (1 - w) * d_b)
+    return ratio, slope
+
+def neutral_fermi_level(kT, N_D = 0, N_A = 0, E_C = E_C, E_V = E_V, E_D = E_D, E_A = E_A,
+                        m_e = M_E, m_h = M_H, g_D = 1, g_A = 1, tol = 1e-12, maxiter = 100):
+
+    """
+    Fermi level of a charge-neutral semiconductor, n + N_A- = p + N_D+, for many temperatures and dopings at once
+
+    Input:
+    ---
+    kT: temperature in energy units (broadcastable array)
+    N_D, N_A: donor and acceptor densities (broadcastable arrays)
+    E_C, E_V, E_D, E_A, m_e, m_h, g_D, g_A: band and impurity parameters (see carrier_densities)
+    tol: absolute tolerance on E_F
+    maxiter: maximum number of iterations
+
+    Returns:
+    ---
+    The Fermi level, with the broadcast shape of kT, N_D and N_A
+
+    """
+
+    kT, N_D, N_A = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (kT, N_D, N_A)))
+    shape = kT.shape
+    kT, N_D, N_A = kT.ravel(), N_D.ravel(), N_A.ravel()
+    constants = (E_C, E_V, E_D, E_A, m_e, m_h, g_D, g_A)
+
+    # Bracket the root: far below the valence band the holes, far above the conduction band the electrons win
+    width = 40 * kT + (E_C - E_V)
+    lo = min(E_V, E_A, E_D) - width
+    hi = max(E_C, E_A, E_D) + width
+    while True:
+        low = _log_ratio(lo, kT, N_D, N_A, *constants)[0] > 0
+        high = _log_ratio(hi, kT, N_D, N_A, *constants)[0] < 0
+        if not (low.any() or high.any()):
+            break
+        lo, hi = np.where(low, 2*lo - hi, lo), np.where(high, 2*hi - lo, hi)
+
+    # Newton steps from mid-gap, replaced by bisection whenever they leave the bracket or do not at least
+    # halve the previous step (which stops cycles on the plateaus of compensated samples); only the points
+    # that have not converged are carried to the next iteration
+    E_F = np.clip((E_C + E_V) / 2, lo, hi)
+    last = hi - lo
+    active = np.arange(E_F.size)
+    for _ in range(maxiter):
+        x = E_F[active]
+        ratio, slope = _log_ratio(x, kT[active], N_D[active], N_A[active], *constants)
+        a, b = np.where(ratio < 0, x, lo[active]), np.where(ratio > 0, x, hi[active])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            step = x - ratio / slope
+        newton = (step >= a) & (step <= b) & (np.abs(step - x) <= last[active] / 2)
+        step = np.where(newton, step, (a + b) / 2)
+        E_F[active], lo[active], hi[active], last[active] = step, a, b, np.abs(step - x)
+        active = active[(np.abs(step - x) >= tol) & (ratio != 0)]
+        if active.size == 0:
+            break
+    return E_F.reshape(shape)
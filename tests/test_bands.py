@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from bands import (TEMPORARIES, cumulative_states, evaluate_grid, fermi_level, graphene_bands, nfe_bands,
+                   nfe_bands_2d)
+
+ENERGIES = np.arange(10.)
+
+def test_fermi_level_fillings():
+    assert fermi_level(ENERGIES) == 9
+    assert fermi_level(ENERGIES, .5) == 9 # less than one state per electron is a full band
+    assert np.array_equal(fermi_level(ENERGIES, [1, 2, 10]), [9, 4, 0])
+
+def test_fermi_level_without_electrons():
+    with pytest.raises(ValueError):
+        fermi_level(ENERGIES, 11)
+    with pytest.raises(ValueError):
+        fermi_level(ENERGIES, [2, 20])
+    with pytest.raises(ValueError):
+        fermi_level(np.full(4, np.nan))
+    with pytest.raises(ValueError):
+        fermi_level(None, 11, cumulative_states(ENERGIES, 16))
+
+# The per-k loops of 5-1-bloch and 5-2-bands
+def energy(k, V=1):
+    k = (k + np.pi) % (2*np.pi) - np.pi
+    k_vals = k + 2*np.pi * np.arange(-1, 2)
+    h = np.diag(k_vals**2) + V * (1 - np.identity(3))
+    return np.linalg.eigvalsh(h)
+
+def E(k_x, k_y):
+    delta = np.array([-2*np.pi, 0, 2*np.pi])
+    H = np.diag(((k_x + delta)[:, np.newaxis]**2 + (k_y + delta)[np.newaxis]**2).flatten())
+    return tuple(np.linalg.eigvalsh(H + 5)[:3])
+
+def test_nfe_bands_matches_notebook_1d():
+    k = np.linspace(-3*np.pi, 3*np.pi, 301)
+    expected = np.vectorize(energy, signature="(),()->(m)")(k, 3)
+    assert np.allclose(nfe_bands(k, V = 3), expected, rtol = 0, atol = 1e-10)
+
+def test_nfe_bands_2d_matches_notebook():
+    momenta = np.linspace(-2*np.pi, 2*np.pi, 41)
+    kx, ky = momenta[:, np.newaxis], momenta[np.newaxis, :]
+    expected = np.array(np.vectorize(E, otypes=(float, float, float))(kx, ky))
+    bands = nfe_bands_2d(kx, ky, V = 5, V0 = 5, nbands = 3, reduce = False)
+    assert bands.shape == expected.shape
+    assert np.allclose(bands, expected, rtol = 0, atol = 1e-10)
+
+def test_evaluate_grid_tiles_match_single_call(tmp_path):
+    kx = np.linspace(-np.pi, np.pi, 41)
+    ky = np.linspace(-np.pi, np.pi, 37)
+    KX, KY = np.meshgrid(kx, ky)
+    whole = graphene_bands(KX, KY)
+    # A budget of a few rows splits the grid into uneven tiles
+    memory = 3 * len(kx) * 2 * 8 * TEMPORARIES
+    tiled = evaluate_grid(graphene_bands, kx, ky, nbands = 2, dtype = np.float64, memory = memory)
+    assert np.array_equal(tiled, whole)
+    threaded = evaluate_grid(graphene_bands, kx, ky, nbands = 2, dtype = np.float64, memory = memory,
+                             workers = 3)
+    assert np.array_equal(threaded, whole)
+    mapped = evaluate_grid(graphene_bands, kx, ky, nbands = 2, memory = memory,
+                           filename = tmp_path / 'bands.npy')
+    assert np.array_equal(np.load(tmp_path / 'bands.npy'), whole.astype(np.float32))
+    assert mapped.dtype == np.float32
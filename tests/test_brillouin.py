@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from brillouin import first_zone, fold, reciprocal_points, reciprocal_vectors, zone_index, zone_mask
+from crystal import LATTICES
+
+@pytest.mark.parametrize('name', ['chain', 'square', 'triangular', 'honeycomb', 'bcc', 'fcc'])
+def test_fold_into_first_zone(name):
+    vectors = LATTICES[name][0]
+    B = reciprocal_vectors(name)
+    assert np.allclose(B @ vectors.T, 2 * np.pi * np.eye(len(B)))
+
+    k = np.random.default_rng(0).uniform(-15, 15, (500, len(B)))
+    folded = fold(k, name)
+    # Folding moves k by a reciprocal lattice vector into the first zone, and the zone onto itself
+    n = (k - folded) @ vectors.T / (2 * np.pi)
+    assert np.allclose(n, np.rint(n))
+    assert np.all(zone_index(folded, name) == 1)
+    assert np.allclose(fold(folded, name), folded)
+
+def test_first_zone_of_square():
+    corners = first_zone('square')
+    assert np.allclose(corners[0], corners[-1])
+    assert np.allclose(np.sort(np.abs(corners[:-1]).ravel()), np.pi)
+    assert len(reciprocal_points('square', 2 * np.pi)) == 4
+
+def test_zones_have_equal_area():
+    # Every Brillouin zone holds one reciprocal cell, (2 pi / a)^2 for the square lattice
+    k = np.linspace(-3 * np.pi, 3 * np.pi, 601)
+    step = k[1] - k[0]
+    KX, KY = np.meshgrid(k, k)
+    for n in (1, 2, 3):
+        assert zone_mask(KX, KY, 'square', n).sum() * step**2 == pytest.approx((2 * np.pi)**2, rel = 2e-2)
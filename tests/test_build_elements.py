@@ -0,0 +1,58 @@
+import os
+import shutil
+
+import numpy as np
+
+import build_elements
+from SSP import ELEMENTS, load_elements
+
+# Two element blocks of each data page as saved from a browser: a row naming the element, then one row per source
+HEAT_CAPACITY = """<html><body><table>
+<tr><th></th><th>use</th><th colspan="2">J/(mol·K)</th></tr>
+<tr><td>5 B boron</td></tr>
+<tr><td>use</td><td></td><td>11.087</td><td></td></tr>
+<tr><td>CRC</td><td></td><td>11.087</td><td></td></tr>
+<tr><td>80 Hg mercury</td></tr>
+<tr><td>use</td><td></td><td>27.98</td><td></td></tr>
+<tr><td>CRC</td><td></td><td>(liquid) 27.983<sup>[1]</sup></td><td></td></tr>
+</table></body></html>"""
+
+EXPANSION = """<html><body><table>
+<tr><th></th><th>linear, µm·m<sup>−1</sup>·K<sup>−1</sup></th></tr>
+<tr><td>5 B boron</td></tr>
+<tr><td>use</td><td>(β form) 6</td></tr>
+<tr><td>WEL</td><td>6</td></tr>
+<tr><td>80 Hg mercury</td></tr>
+<tr><td>use</td><td>60.4<br/>(at 25 °C)</td></tr>
+<tr><td>CRC</td><td>−</td></tr>
+</table></body></html>"""
+
+def test_parse_saved_pages(tmp_path):
+    (tmp_path / 'heat.html').write_text(HEAT_CAPACITY, encoding='utf-8')
+    (tmp_path / 'expansion.html').write_text(EXPANSION, encoding='utf-8')
+
+    assert build_elements.parse_page(str(tmp_path / 'heat.html'), *build_elements.SOURCES['heat_capacity']) == {
+        5: ('B', 'Boron', 11.087), 80: ('Hg', 'Mercury', 27.983)}
+    assert build_elements.parse_page(str(tmp_path / 'expansion.html'), *build_elements.SOURCES['expansion']) == {
+        5: ('B', 'Boron', 6.0), 80: ('Hg', 'Mercury', 60.4)}
+
+    # A page replaces every value of its property
+    output = str(tmp_path / 'elements.csv')
+    shutil.copy(ELEMENTS, output)
+    build_elements.main(['--expansion', str(tmp_path / 'expansion.html'), '--output', output])
+    table = load_elements(output, cache = False)
+    assert table['expansion'][table['symbol'] == 'Hg'] == 60.4
+    assert np.isnan(table['expansion'][table['symbol'] == 'Au'])
+    assert np.array_equal(table['heat_capacity'], load_elements(ELEMENTS, cache = False)['heat_capacity'], equal_nan = True)
+
+def test_bundled_table_is_normalised(tmp_path):
+    # Rewriting the bundled file without pages leaves it unchanged
+    output = str(tmp_path / 'elements.csv')
+    shutil.copy(ELEMENTS, output)
+    build_elements.main(['--output', output])
+    with open(ELEMENTS, encoding='utf-8') as a, open(output, encoding='utf-8') as b:
+        assert a.read() == b.read()
+    table = load_elements(ELEMENTS, cache = False)
+    assert len(table) == 94 and np.array_equal(table['Z'], np.arange(1, 95))
+    for symbol in ('B', 'C', 'As', 'Gd', 'Hg'):
+        assert np.isfinite(table['expansion'][table['symbol'] == symbol]).all()
@@ -0,0 +1,80 @@
+import os
+import webbrowser
+
+import numpy as np
+import pytest
+
+import crystal
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # Figures, html stamps and exports all go to a temporary directory
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(crystal, 'CACHE_DIR', str(tmp_path / 'cache'))
+    return tmp_path
+
+def test_widget_renders_and_exports(workdir, monkeypatch):
+    opened = []
+    monkeypatch.setattr(webbrowser, 'open', lambda *args, **kwargs: opened.append(args))
+    for build, filename in ((crystal.build_simple_lattice, '4-1-simple_lattice.html'),
+                            (crystal.build_reciprocal, '4-2-reciprocal.html')):
+        crystal.render(build(), filename, auto_open = False)
+        html = (workdir / filename).read_text(encoding = 'utf-8')
+        assert 'Plotly.newPlot' in html
+    assert sorted(p.name for p in workdir.glob('*.html')) == ['4-1-simple_lattice.html', '4-2-reciprocal.html']
+    assert opened == []
+
+def test_export_skips_unchanged_figure(workdir):
+    fig = crystal.build_periodic()
+    path = crystal.export_html(fig, 'periodic', auto_open = False)
+    mtime = os.stat(path).st_mtime_ns
+    crystal.export_html(fig, 'periodic', auto_open = False)
+    assert os.stat(path).st_mtime_ns == mtime
+
+def test_reciprocal_short_slider(workdir):
+    fig = crystal.build_reciprocal(N_values = 3)
+    assert fig['layout']['sliders'][0]['active'] == 2
+
+def test_decimated_graphene_keeps_default_view(workdir):
+    small, large = crystal.build_graphene(10, decimate = True), crystal.build_graphene(60, decimate = True)
+    assert large['layout']['xaxis']['range'] == small['layout']['xaxis']['range']
+    assert len(large['data'][0]['x']) == len(small['data'][0]['x'])
+
+def _segments(x, y):
+    # Bonds as a set of unordered pairs of rounded end points
+    ends = np.stack([x, y], axis=1).reshape(-1, 3, 2)[:, :2].round(9)
+    return {frozenset(map(tuple, pair)) for pair in ends}
+
+def _pairs(start, end):
+    return {frozenset([tuple(a), tuple(b)]) for a, b in zip(start.round(9), end.round(9))}
+
+def test_bonds_against_brute_force():
+    points = crystal.named_lattice('honeycomb', 6)
+    dist = np.linalg.norm(points[:, None] - points[None], axis=-1)
+    i, j = np.nonzero(np.triu((dist >= 1.1) & (dist <= 1.8), 1))
+    assert len(i) > 50
+    assert _segments(*crystal.bonds(points, 1.8, r_min = 1.1)) == _pairs(points[i], points[j])
+    # Bonds between two sets of points
+    others = points[::3] + [.3, .1]
+    i, j = np.nonzero(np.linalg.norm(points[:, None] - others[None], axis=-1) <= 1.2)
+    assert _segments(*crystal.bonds(points, 1.2, others)) == _pairs(points[i], others[j])
+
+def _sorted(points):
+    points = points.round(9)
+    return points[np.lexsort(points.T)]
+
+def test_lattice_points_against_loop():
+    vectors, basis = crystal.LATTICES['diamond']
+    expected = [b + n1 * vectors[0] + n2 * vectors[1] + n3 * vectors[2]
+                for b in basis for n3 in range(-2, 1) for n2 in range(-2, 1) for n1 in range(-2, 2)]
+    points = crystal.lattice_points(vectors, (4, 3, 3), basis)
+    assert np.allclose(points, expected)
+    # The chunks of the iterator hold the basis of their own cells only, so only the set of points agrees
+    chunks = np.concatenate(list(crystal.iter_lattice_points(vectors, (4, 3, 3), basis, chunk = 5)))
+    assert _sorted(chunks).tolist() == _sorted(points).tolist()
+    assert np.allclose(crystal.named_lattice('diamond', (4, 3, 3)), points)
+    a1, a2 = crystal.LATTICES['triangular'][0]
+    view = crystal.viewport_points([a1, a2], 8, view = [(-2, 2), (-1, 1)], margin = 0, chunk = 7)
+    inside = crystal.lattice_generation(a1, a2, 8)
+    inside = inside[(np.abs(inside[:, 0]) <= 2) & (np.abs(inside[:, 1]) <= 1)]
+    assert _sorted(view).tolist() == _sorted(inside).tolist()
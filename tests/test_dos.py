@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+import dos
+from bands import evaluate_grid, graphene_bands
+from dos import gaussian_dos, triangle_counts, triangle_dos
+
+def _graphene_grid(n = 101):
+    k = np.linspace(-np.pi, np.pi, n)
+    return evaluate_grid(graphene_bands, k, k, nbands = 2, dtype = np.float64)
+
+def test_triangle_dos_normalised_to_bands():
+    E, g = triangle_dos(_graphene_grid(), 200)
+    assert np.sum(g * np.diff(E).mean()) == pytest.approx(2)
+    assert np.all(g >= 0)
+    # Bins beyond the bands take the states inside them only
+    counts = triangle_counts(_graphene_grid(), np.linspace(-20, 0, 41))
+    assert counts.sum() == pytest.approx(1)
+
+def test_triangle_counts_chain_closed_form():
+    # E = -2 cos k on k in [0, pi] has the cumulative fraction arccos(-E/2)/pi
+    energies = -2 * np.cos(np.linspace(0, np.pi, 2001))
+    edges = np.linspace(-2, 2, 17)
+    assert np.allclose(triangle_counts(energies, edges), np.diff(np.arccos(-edges / 2) / np.pi), atol = 1e-4)
+
+def test_triangle_counts_independent_of_chunk(monkeypatch):
+    energies = _graphene_grid(41)
+    edges = np.linspace(-13, 13, 27)
+    whole = triangle_counts(energies, edges)
+    monkeypatch.setattr(dos, 'CHUNK', 100)
+    assert np.allclose(triangle_counts(energies, edges), whole)
+
+def test_gaussian_dos_normalised_to_bands():
+    E, g = gaussian_dos(_graphene_grid(), np.linspace(-15, 15, 601), sigma = .2)
+    assert np.trapezoid(g, E) == pytest.approx(2, rel = 1e-3)
@@ -0,0 +1,82 @@
+import os
+import shutil
+
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.integrate import quad
+
+import phonons
+from heatcapacity import c_debye, c_phonon, fit_materials, fit_phonon, phonon_thermodynamics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_bad_file_gets_nan_row(tmp_path):
+    shutil.copy(os.path.join(ROOT, 'Heat_capacity_Ag.csv'), tmp_path / 'Ag.csv')
+    shutil.copy(os.path.join(ROOT, 'elements.csv'), tmp_path / 'elements.csv')
+    (tmp_path / 'empty.csv').write_text('')
+
+    fits = fit_materials(str(tmp_path), processes = 1)
+
+    assert list(fits.index) == ['Ag', 'elements', 'empty']
+    assert pd.isna(fits.loc['Ag', 'error'])
+    assert 200 < fits.loc['Ag', 'theta_D'] < 230
+    for bad in ('elements', 'empty'):
+        assert fits.loc[bad, 'error'].startswith(('ValueError', 'IndexError'))
+        assert np.isnan(fits.loc[bad, 'theta_D']) and fits.loc[bad, 'n_points'] == 0
+
+def test_bad_file_in_pool(tmp_path):
+    shutil.copy(os.path.join(ROOT, 'Heat_capacity_Ag.csv'), tmp_path / 'Ag.csv')
+    (tmp_path / 'missing_columns.csv').write_text('x,y\n1,2\n')
+
+    fits = fit_materials(str(tmp_path), processes = 2)
+
+    assert np.isfinite(fits.loc['Ag', 'theta_D'])
+    assert np.isnan(fits.loc['missing_columns', 'omega_E'])
+
+def test_debye_against_quad():
+    integrand = lambda y: y**4 * np.exp(-y) / np.expm1(-y)**2 if y > 0 else 0.
+    for u in (1e-3, .3, 1, 5, 19.9, 20.1, 40, 300):
+        reference = 9 * quad(integrand, 0, u, epsabs = 0, epsrel = 1e-13, limit = 200)[0] / u**3
+        assert abs(c_debye(1, u) - reference) < 1e-14
+
+def test_debye_limits():
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        C = c_debye(np.array([0, 1e-300, 1e300, np.inf]), 300)
+    assert np.array_equal(C, [0, 0, 3, 3])
+    with pytest.raises(ValueError):
+        c_debye([10, -1], 300)
+
+def _debye_dos(bins = 4000):
+    # g = 9 w^2 per atom up to the cutoff w = 1, holding 3 modes
+    edges = np.linspace(0, 1, bins + 1)
+    return edges, 3 * np.diff(edges**3) / np.diff(edges)
+
+def test_phonon_dos_heat_capacity_matches_debye():
+    T = np.array([5, 20, 50, 100, 300, 1000.])
+    assert np.allclose(c_phonon(T, 400, _debye_dos()), c_debye(T, 400), rtol = 1e-3)
+    theta, _ = fit_phonon(T, c_debye(T, 350), _debye_dos(), theta = 300)
+    assert theta == pytest.approx(350, rel = 1e-3)
+
+def test_phonon_thermodynamics_relations():
+    T, h = np.linspace(10, 600, 30), 1e-3
+    result = phonon_thermodynamics(T, _debye_dos(), 400)
+    assert np.allclose(result['F'], result['U'] - T * result['S'])
+    # C = dU/dT and S = -dF/dT, by central differences
+    above, below = phonon_thermodynamics(T + h, _debye_dos(), 400), phonon_thermodynamics(T - h, _debye_dos(), 400)
+    assert np.allclose((above['U'] - below['U']) / (2 * h), result['C'], rtol = 1e-5)
+    assert np.allclose((below['F'] - above['F']) / (2 * h), result['S'], rtol = 1e-5)
+
+def test_sampled_phonon_dos(tmp_path, monkeypatch):
+    monkeypatch.setattr(phonons, 'CACHE_DIR', str(tmp_path))
+    dos = phonons.phonon_dos('fcc', phonons.neighbour_springs('fcc'), N = 16, bins = 64)
+    edges, g = dos
+    assert np.sum(g * np.diff(edges)) == pytest.approx(3)
+    # The second call reads the stored copy
+    assert len(os.listdir(tmp_path)) == 1
+    assert np.array_equal(phonons.phonon_dos('fcc', phonons.neighbour_springs('fcc'), N = 16, bins = 64)[1], g)
+    # Every mode is excited classically at high temperature
+    assert c_phonon(1e5, 300, dos) == pytest.approx(3, rel = 1e-4)
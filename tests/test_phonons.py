@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from phonons import chain_model, neighbour_springs, phonon_frequencies
+
+K = np.linspace(-np.pi, np.pi, 41)
+
+def test_monatomic_chain():
+    lattice, springs = chain_model([2.])
+    omega = phonon_frequencies(K, lattice, springs, masses = 3)
+    assert omega.shape == (41, 1)
+    assert np.allclose(omega[:, 0], 2 * np.sqrt(2 / 3) * np.abs(np.sin(K / 2)))
+
+def test_next_nearest_neighbour_chain():
+    omega = phonon_frequencies(K, 'chain', neighbour_springs('chain', (1, .4)))
+    assert np.allclose(omega[:, 0]**2, 4 * (np.sin(K / 2)**2 + .4 * np.sin(K)**2))
+
+def test_diatomic_chain_springs():
+    # Two springs per cell of length a = 2, equal masses
+    k1, k2, m = 1., 3., 2.
+    lattice, springs = chain_model([k1, k2], a = 2)
+    omega = phonon_frequencies(K / 2, lattice, springs, masses = m)
+    root = np.sqrt(k1**2 + k2**2 + 2 * k1 * k2 * np.cos(K))
+    assert np.allclose(omega**2, np.stack([k1 + k2 - root, k1 + k2 + root], axis=1) / m)
+
+def test_diatomic_chain_masses():
+    m1, m2 = 1., 4.
+    lattice, springs = chain_model([1., 1.])
+    omega = phonon_frequencies(K, lattice, springs, masses = (m1, m2))
+    mu = 1 / m1 + 1 / m2
+    root = np.sqrt(mu**2 - 4 * np.sin(K / 2)**2 / (m1 * m2))
+    assert np.allclose(omega**2, np.stack([mu - root, mu + root], axis=1))
+
+@pytest.mark.parametrize('name', ['sc', 'bcc', 'fcc', 'diamond'])
+def test_acoustic_branches_vanish_at_gamma(name):
+    omega = phonon_frequencies(np.zeros((1, 3)), name, neighbour_springs(name))
+    assert np.allclose(omega[0, :3], 0, atol = 1e-6)
+    # Optical branches of the diamond lattice stay finite
+    assert np.all(omega[0, 3:] > .1)
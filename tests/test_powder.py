@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from powder import d_spacing, index_cubic, index_pattern, reflections, wavelength
+from SSP import const, e
+
+A = 4.05e-10 # lattice constant of the synthetic FCC crystal [m]
+MOMENERGY = 8048 # Cu K-alpha photons [eV]
+
+def _fcc_angles(wl):
+    N, hkl, M = reflections('FCC')
+    s = wl * np.sqrt(N) / (2 * A)
+    return 2 * np.rad2deg(np.arcsin(s[s < np.sin(np.deg2rad(70))]))
+
+def test_fcc_reflections():
+    N, hkl, M = reflections('FCC')
+    assert N[:5].tolist() == [3, 4, 8, 11, 12]
+    assert [tuple(x) for x in hkl[:3]] == [(1, 1, 1), (2, 0, 0), (2, 2, 0)]
+    assert M[:3].tolist() == [8, 6, 12]
+
+def test_index_cubic_fcc():
+    wl = wavelength(MOMENERGY)
+    assert wl == pytest.approx(const.h * const.c / (MOMENERGY * e))
+    d = d_spacing(_fcc_angles(wl), wl)
+    # Peak positions read off a measurement carry a small scatter
+    d = d * (1 + 1e-4 * np.random.default_rng(0).standard_normal(len(d)))
+    result = index_cubic(d)
+    assert result['structure'] == 'FCC'
+    assert result['a'] == pytest.approx(A, rel = 1e-3)
+    assert result['missing'] == 0
+    assert result['peaks']['N'].tolist()[:4] == [3, 4, 8, 11]
+
+def test_index_pattern_synthetic_fcc(tmp_path):
+    wl = wavelength(MOMENERGY)
+    angle = np.arange(20, 140, .01)
+    intensity = sum(np.exp(-(angle - peak)**2 / (2 * .05**2)) for peak in _fcc_angles(wl))
+    filename = tmp_path / 'fcc.x_y'
+    np.savetxt(filename, np.column_stack([angle, intensity]), fmt = '%.3f')
+    result = index_pattern(str(filename), MOMENERGY)
+    assert result['structure'] == 'FCC'
+    assert result['a'] == pytest.approx(A, rel = 1e-3)
+    assert len(result['peaks']) == len(_fcc_angles(wl))
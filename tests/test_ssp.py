@@ -0,0 +1,33 @@
+import os
+
+import numpy as np
+
+import SSP
+
+def test_load_xy_caches_sidecar(tmp_path):
+    source = tmp_path / 'pattern.x_y'
+    source.write_text('10 1\n20 4\n30 9\n')
+    first = SSP.load_xy(str(source))
+    sidecar = str(source) + '.npy'
+    assert os.stat(sidecar).st_mtime_ns == os.stat(source).st_mtime_ns
+    assert sorted(os.listdir(tmp_path)) == ['pattern.x_y', 'pattern.x_y.npy'] # no temporary file left
+    second = SSP.load_xy(str(source))
+    assert isinstance(second, np.memmap)
+    assert np.array_equal(first, second) and first.shape == (3, 2)
+
+def test_lazy_class_proxy():
+    from IPython.display import HTML as RealHTML
+
+    class Page(SSP.HTML):
+        pass
+
+    assert isinstance(SSP.HTML('<b>x</b>'), SSP.HTML) and isinstance(Page('x'), SSP.HTML)
+    assert issubclass(Page, SSP.HTML) and issubclass(Page, RealHTML)
+    assert not isinstance('x', SSP.HTML)
+
+def test_star_import_exports_public_names():
+    namespace = {}
+    exec('from SSP import *', namespace)
+    assert {'np', 'pd', 'plt', 'curve_fit', 'load_elements', 'm_e'} <= set(namespace)
+    assert not {'sys', 'types', 'importlib', '_LazyModule', '_LazyObject'} & set(namespace)
+    assert SSP.pd.__version__
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from tightbinding import (KPM_MARGIN, bloch_bands, chain_dos, chain_eigenvalues, chain_hamiltonian, chain_onsite,
+                          hopping_terms, kpm_dos, neighbour_hoppings, real_space_hamiltonian, sturm_count)
+
+def test_chain_eigenvalues_against_eigvalsh():
+    H = chain_hamiltonian(50, epsilon = 1.5, t = .7).toarray()
+    assert np.allclose(chain_eigenvalues(50, 1.5, .7), np.linalg.eigvalsh(H))
+    onsite = chain_onsite(60, W = 2, seed = 4)
+    H = chain_hamiltonian(60, epsilon = onsite).toarray()
+    assert np.allclose(chain_eigenvalues(60, onsite), np.linalg.eigvalsh(H))
+    assert np.allclose(chain_eigenvalues(60, onsite, select = (5, 9)), np.linalg.eigvalsh(H)[5:10])
+
+def test_sturm_count_against_eigvalsh():
+    onsite = chain_onsite(200, W = 3, seed = 2)
+    evals = np.linalg.eigvalsh(chain_hamiltonian(200, epsilon = onsite).toarray())
+    E = np.linspace(-1, 5, 97)
+    assert np.array_equal(sturm_count(onsite, 1, E), np.searchsorted(evals, E))
+
+def test_chain_dos_histograms():
+    onsite = chain_onsite(300, W = 1, seed = 5)
+    for epsilon in (2, onsite):
+        counts, edges = chain_dos(300, epsilon, bins = 20, chunk = 64)
+        evals = np.linalg.eigvalsh(chain_hamiltonian(300, epsilon = epsilon).toarray())
+        assert counts.sum() == 300
+        assert np.array_equal(counts, np.histogram(evals, edges)[0])
+
+def test_square_lattice_bands_closed_form():
+    k = np.random.default_rng(1).uniform(-np.pi, np.pi, (200, 2))
+    kx, ky = k.T
+    bands = bloch_bands(k, 'square', neighbour_hoppings('square', (1, .3)), onsite = .5)
+    assert np.allclose(bands[:, 0], .5 - 2*(np.cos(kx) + np.cos(ky)) - 4*.3*np.cos(kx)*np.cos(ky))
+
+def test_honeycomb_bands_closed_form():
+    vectors = np.array([[np.sqrt(3), 0], [np.sqrt(3)/2, 3/2]])
+    k = np.random.default_rng(2).uniform(-3, 3, (200, 2))
+    bands = bloch_bands(k, 'honeycomb', neighbour_hoppings('honeycomb', 2.7), chunk = 64)
+    f = np.abs(1 + np.exp(1j * k @ vectors[0]) + np.exp(1j * k @ vectors[1]))
+    assert np.allclose(bands, np.stack([-2.7*f, 2.7*f], axis=1))
+
+def test_hopping_terms_match_neighbours():
+    hops = hopping_terms([(0, 0, 1, 1)])
+    assert np.allclose(bloch_bands(np.linspace(-3, 3, 11), 'chain', hops),
+                       bloch_bands(np.linspace(-3, 3, 11), 'chain', neighbour_hoppings('chain')))
+
+def test_periodic_flake_matches_bloch_bands():
+    N = 6
+    hoppings = neighbour_hoppings('triangular', (1, .2))
+    H, positions = real_space_hamiltonian('triangular', hoppings, N, periodic = True)
+    assert positions.shape == (N*N, 2)
+    # The allowed k of the torus are m1 b1/N + m2 b2/N
+    b = 2*np.pi * np.linalg.inv(np.array([[1, 0], [.5, np.sqrt(3)/2]])).T
+    m = np.array(np.meshgrid(np.arange(N), np.arange(N))).reshape(2, -1).T
+    bands = bloch_bands(m @ b / N, 'triangular', hoppings)
+    assert np.allclose(np.linalg.eigvalsh(H.toarray()), np.sort(bands.ravel()))
+
+def test_kpm_dos_matches_chain_histogram():
+    n = 2000
+    # The spectrum [0, 4] is rescaled into [-1, 1] with KPM_MARGIN to spare, the energies cover all of it
+    half = 4 / (2 - 2 * KPM_MARGIN)
+    E, rho = kpm_dos(chain_hamiltonian(n), energies = np.linspace(2 - half, 2 + half, 20001), moments = 512,
+                     vectors = 32, seed = 1)
+    # Normalised to the number of states
+    assert np.trapezoid(rho, E) == pytest.approx(n, rel = 1e-3)
+    # States per bin of width 0.5, well above the energy resolution
+    edges = np.linspace(0, 4, 9)
+    exact = np.histogram(chain_eigenvalues(n), edges)[0]
+    cumulative = np.concatenate([[0], np.cumsum((rho[1:] + rho[:-1]) / 2 * np.diff(E))])
+    binned = np.diff(np.interp(edges, E, cumulative))
+    assert np.allclose(binned, exact, rtol = .05)
+
+def test_kpm_dos_seed_fixes_result():
+    H = chain_hamiltonian(500, epsilon = np.random.default_rng(0).random(500))
+    _, serial = kpm_dos(H, 64, moments = 64, vectors = 20, seed = 3)
+    _, parallel = kpm_dos(H, 64, moments = 64, vectors = 20, seed = 3, processes = 2)
+    assert np.allclose(serial, parallel, rtol = 1e-10)
+
+def test_kpm_dos_unknown_kernel():
+    with pytest.raises(ValueError):
+        kpm_dos(chain_hamiltonian(10), kernel = 'lorentz')
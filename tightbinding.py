@@ -0,0 +1,503 @@
+#!/usr/bin/python
+
+"""
+tightbinding.py: tight-binding Hamiltonians and their spectra without building dense matrices
+"""
+
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+from scipy import sparse
+from scipy.sparse.linalg import eigsh
+from scipy.linalg import eigvalsh_tridiagonal
+
+from SSP import *
+from crystal import LATTICES
+
+CHUNK = 2**14 # number of eigenvalues computed and histogrammed at a time
+
+######### 1D chains #########
+
+def chain_onsite(n, epsilon = 2, W = 0, seed = None):
+
+    """
+    On-site energies of an n-atom chain, optionally with uniform (Anderson) disorder
+
+    Input:
+    ---
+    n: number of atoms
+    epsilon: mean on-site energy
+    W: width of the disorder, energies are drawn from [epsilon - W/2, epsilon + W/2]
+    seed: seed for numpy.random.default_rng
+
+    Returns:
+    ---
+    An array of n on-site energies
+
+    """
+
+    if W == 0:
+        return np.full(n, float(epsilon))
+    rng = np.random.default_rng(seed)
+    return epsilon + W * (rng.random(n) - 0.5)
+
+def chain_hamiltonian(n, epsilon = 2, t = 1, periodic = False):
+
+    """
+    Sparse Hamiltonian of an n-atom chain
+
+    Input:
+    ---
+    n: number of atoms
+    epsilon: on-site energy, scalar or array of length n
+    t: hopping
+    periodic: True connects the last atom to the first
+
+    Returns:
+    ---
+    The Hamiltonian as a scipy.sparse csr matrix
+
+    """
+
+    d = np.broadcast_to(np.asarray(epsilon, dtype=float), (n,))
+    H = sparse.diags([d, -t*np.ones(n-1), -t*np.ones(n-1)], [0, 1, -1], format='lil')
+    if periodic and n > 2:
+        H[0, n-1] = H[n-1, 0] = -t
+    return H.tocsr()
+
+def chain_eigenvalues(n, epsilon = 2, t = 1, select = None):
+
+    """
+    Eigenvalues of an open n-atom chain
+
+    Input:
+    ---
+    n: number of atoms
+    epsilon: on-site energy, scalar (uniform chain) or array of length n (e.g. from chain_onsite)
+    t: hopping
+    select: optional (lo, hi) range of eigenvalue indices to compute, hi inclusive
+
+    Returns:
+    ---
+    The eigenvalues in ascending order
+
+    """
+
+    lo, hi = (0, n-1) if select is None else select
+
+    if np.ndim(epsilon) == 0:
+        # Uniform chain: E_j = epsilon - 2t cos(j pi / (n + 1)), j = 1..n
+        j = np.arange(lo + 1, hi + 2)
+        evals = epsilon - 2*abs(t)*np.cos(j*np.pi/(n+1))
+        return evals
+
+    # Disordered chain: symmetric tridiagonal solver, O(n) memory
+    d = np.asarray(epsilon, dtype=float)
+    e = -t*np.ones(n-1)
+    if n == 1:
+        return d.copy()
+    if select is None:
+        return eigvalsh_tridiagonal(d, e)
+    return eigvalsh_tridiagonal(d, e, select='i', select_range=(lo, hi))
+
+def sturm_count(epsilon, t, E):
+
+    """
+    Number of eigenvalues of an open chain below each energy, from the Sturm sequence
+
+    Input:
+    ---
+    epsilon: array of n on-site energies
+    t: hopping
+    E: array of energies
+
+    Returns:
+    ---
+    An integer array with the same shape as E
+
+    """
+
+    # Counts the negative pivots of the LDL^T factorisation of H - E, O(n) per energy
+    E = np.asarray(E, dtype=float)
+    t2 = float(t)**2
+    tiny = np.finfo(float).tiny
+    q = np.ones_like(E)
+    count = np.zeros(E.shape, dtype=np.int64)
+    for i, d in enumerate(np.asarray(epsilon, dtype=float)):
+        q = (d - E) - (t2 / q if i else 0)
+        q[q == 0] = -tiny
+        count += q < 0
+    return count
+
+def chain_dos(n, epsilon = 2, t = 1, bins = 30, chunk = CHUNK):
+
+    """
+    Histogram of the eigenvalues of an open n-atom chain, without holding the whole spectrum
+
+    Input:
+    ---
+    n: number of atoms
+    epsilon: on-site energy, scalar or array of length n
+    t: hopping
+    bins: number of histogram bins
+    chunk: number of eigenvalues held in memory at a time (uniform chain)
+
+    Returns:
+    ---
+    The counts and the bin edges, as for np.histogram
+
+    """
+
+    # Every eigenvalue lies inside the Gershgorin bounds
+    eps = np.asarray(epsilon, dtype=float)
+    edges = np.linspace(eps.min() - 2*abs(t), eps.max() + 2*abs(t), bins + 1)
+
+    if np.ndim(epsilon) == 0:
+        # Stream the closed-form spectrum through the histogram
+        counts = np.zeros(bins, dtype=np.int64)
+        for lo in range(0, n, chunk):
+            evals = chain_eigenvalues(n, epsilon, t, select=(lo, min(lo + chunk, n) - 1))
+            counts += np.histogram(evals, edges)[0]
+        return counts, edges
+
+    # Disordered chain: the eigenvalue count below each bin edge gives the histogram directly
+    below = sturm_count(eps, t, edges)
+    below[-1] = n
+    return np.diff(below), edges
+
+def DOS_finite_electron_chain(n, epsilon = 2, t = 1, plot = False, save = False):
+
+    """
+    Solve for the eignvalues of an n-atom molecule
+
+    Input:
+    ------
+    n: number of atoms
+    epsilon: energy (scalar, or array of length n for a disordered chain)
+    t: hopping
+    plot: True returns plot, False returns eigenvalues
+    save: True saves the plot
+
+    Returns:
+    --------
+    plot = False returns the eigenvalues
+
+    """
+
+    if not plot:
+        return chain_eigenvalues(n, epsilon, t)
+
+    counts, edges = chain_dos(n, epsilon, t)
+    plt.figure()
+    plt.stairs(counts, edges, fill=True)
+    plt.xlabel("$E$")
+    plt.ylabel("Number of eigenenergies")
+    if save:
+        plt.savefig(f'3-3-DOS-{n}.svg', facecolor='white', transparent=False, bbox_inches='tight')
+
+######### Lattice models #########
+# A model is a lattice (vectors as rows and a basis, or a name in crystal.LATTICES) and a hopping list,
+# a dictionary of arrays i, j, R, t: the hop from basis site i in cell 0 to basis site j in cell R
+# (integer coordinates along the lattice vectors) enters the Hamiltonian as -t, as in chain_hamiltonian.
+# Every hop is listed in both directions so the Hamiltonians are Hermitian.
+
+SHELL_TOL = 1e-6 # distances closer than this belong to the same neighbour shell
+
+def _lattice(lattice):
+    # (vectors, basis) of a name in crystal.LATTICES or of a (vectors, basis) pair
+    vectors, basis = LATTICES[lattice] if isinstance(lattice, str) else lattice
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=float))
+    basis = np.atleast_2d(np.asarray(basis, dtype=float))
+    return vectors, basis
+
+def hopping_terms(terms):
+
+    """
+    Hopping list from explicitly written hops, adding the reverse of each
+
+    Input:
+    ---
+    terms: list of (i, j, R, t), once per bond: basis sites i and j, the cell R of site j
+           (an integer or a sequence of integers), and the hopping t (may be complex)
+
+    Returns:
+    ---
+    The hopping list, a dictionary of the arrays i, j, R, t
+
+    """
+
+    i, j, R, t = zip(*terms)
+    i, j = np.array(i), np.array(j)
+    R = np.array(R, dtype=int).reshape(len(terms), -1)
+    t = np.array(t)
+    return dict(i = np.concatenate([i, j]), j = np.concatenate([j, i]),
+                R = np.concatenate([R, -R]), t = np.concatenate([t, np.conj(t)]))
+
+def neighbour_hoppings(lattice, t = 1):
+
+    """
+    Hopping list of a lattice with hoppings to the first few neighbour shells
+
+    Input:
+    ---
+    lattice: name in crystal.LATTICES or a (vectors, basis) pair
+    t: hopping to the nearest neighbours, or a sequence (t1, t2, ...) of hoppings to successive shells
+
+    Returns:
+    ---
+    The hopping list, a dictionary of the arrays i, j, R, t
+
+    """
+
+    vectors, basis = _lattice(lattice)
+    t = np.atleast_1d(t)
+    nb, dim = len(basis), len(vectors)
+
+    # Every hop to the cells within len(t) + 1 steps, classified by its length
+    m = len(t) + 1
+    R = np.array(list(itertools.product(range(-m, m+1), repeat=dim)))
+    i, j, r = np.meshgrid(np.arange(nb), np.arange(nb), np.arange(len(R)), indexing='ij')
+    i, j, r = i.ravel(), j.ravel(), r.ravel()
+    length = np.linalg.norm(R[r] @ vectors + basis[j] - basis[i], axis=1)
+    rounded = np.round(length / SHELL_TOL).astype(np.int64)
+    shells = np.unique(rounded[rounded > 0])[:len(t)]
+
+    shell = np.searchsorted(shells, rounded)
+    keep = (rounded > 0) & np.isin(rounded, shells)
+    return dict(i = i[keep], j = j[keep], R = R[r[keep]], t = t[shell[keep]])
+
+def bloch_hamiltonian(k, lattice, hoppings, onsite = 0):
+
+    """
+    Bloch Hamiltonians H(k) of a lattice model for every k-point at once
+
+    Input:
+    ---
+    k: k-points, array of shape (..., dim), or of any shape in 1D
+    lattice: name in crystal.LATTICES or a (vectors, basis) pair
+    hoppings: hopping list (see hopping_terms and neighbour_hoppings)
+    onsite: on-site energy, scalar or one per basis site
+
+    Returns:
+    ---
+    A complex array of shape (..., nb, nb), nb the number of basis sites
+
+    """
+
+    vectors, basis = _lattice(lattice)
+    dim, nb = vectors.shape[1], len(basis)
+    k = np.asarray(k, dtype=float)
+    if dim == 1 and (k.ndim == 0 or k.shape[-1] != 1):
+        k = k[..., None]
+    shape = k.shape[:-1]
+
+    # H_ij(k) = -sum t e^{i k.d} over the hops i -> j, d the vector between the two atoms;
+    # a one-hot matrix sends every hop to its element (i, j) so all k-points take one matmul
+    i, j = hoppings['i'], hoppings['j']
+    d = hoppings['R'] @ vectors + basis[j] - basis[i]
+    onehot = np.zeros((len(d), nb*nb))
+    onehot[np.arange(len(d)), i*nb + j] = 1
+    H = (np.exp(1j * k.reshape(-1, dim) @ d.T) * -hoppings['t']) @ onehot
+    H = H.reshape(shape + (nb, nb))
+    H[..., np.arange(nb), np.arange(nb)] += onsite
+    return H
+
+def bloch_bands(k, lattice, hoppings, onsite = 0, chunk = CHUNK):
+    # Band energies (..., nb) of a lattice model, diagonalising chunk k-points at a time
+    vectors, _ = _lattice(lattice)
+    k = np.asarray(k, dtype=float)
+    if vectors.shape[1] == 1 and (k.ndim == 0 or k.shape[-1] != 1):
+        k = k[..., None]
+    shape = k.shape[:-1]
+    k = k.reshape(-1, k.shape[-1])
+    out = np.concatenate([np.linalg.eigvalsh(bloch_hamiltonian(k[start:start+chunk], lattice, hoppings, onsite))
+                          for start in range(0, len(k), chunk)])
+    return out.reshape(shape + out.shape[-1:])
+
+def real_space_hamiltonian(lattice, hoppings, N = 10, onsite = 0, periodic = False, keep = None):
+
+    """
+    Sparse Hamiltonian of a finite piece of a lattice model: a flake, or a ribbon if periodic along some axes
+
+    Input:
+    ---
+    lattice: name in crystal.LATTICES or a (vectors, basis) pair
+    hoppings: hopping list (see hopping_terms and neighbour_hoppings)
+    N: number of cells along each lattice vector, an integer or one per vector
+    onsite: on-site energy, scalar, one per basis site, or one per site (e.g. from chain_onsite)
+    periodic: True (or one bool per lattice vector) wraps the hops around that axis
+    keep: optional function of the site positions (n, space) returning a mask of the sites kept,
+          to cut out other flake shapes
+
+    Returns:
+    ---
+    The Hamiltonian as a scipy.sparse csr matrix, and the site positions (n, space)
+
+    """
+
+    vectors, basis = _lattice(lattice)
+    dim, nb = len(vectors), len(basis)
+    N = np.broadcast_to(N, (dim,))
+    periodic = np.broadcast_to(periodic, (dim,))
+    cells = np.array(np.unravel_index(np.arange(np.prod(N)), N)).T
+    positions = ((cells @ vectors)[:, None, :] + basis[None, :, :]).reshape(-1, vectors.shape[1])
+
+    # Site index cell * nb + basis site; every hop is applied to all cells at once
+    rows, cols, values = [], [], []
+    for i, j, R, t in zip(hoppings['i'], hoppings['j'], hoppings['R'], hoppings['t']):
+        target = cells + R
+        target[:, periodic] %= N[periodic]
+        inside = np.all((target >= 0) & (target < N), axis=1)
+        rows.append(np.flatnonzero(inside) * nb + i)
+        cols.append(np.ravel_multi_index(target[inside].T, N) * nb + j)
+        values.append(np.full(inside.sum(), -t))
+
+    n = len(positions)
+    onsite = np.asarray(onsite, dtype=float)
+    diagonal = np.tile(onsite, len(cells)) if onsite.ndim and onsite.size == nb else np.broadcast_to(onsite, (n,))
+    H = sparse.coo_matrix((np.concatenate(values), (np.concatenate(rows), np.concatenate(cols))), shape=(n, n))
+    H = (H + sparse.diags(diagonal)).tocsr()
+
+    if keep is not None:
+        mask = np.asarray(keep(positions), dtype=bool)
+        H, positions = H[mask][:, mask], positions[mask]
+    return H, positions
+
+def states_near(H, E = 0, k = 10):
+
+    """
+    The k eigenstates of a sparse Hamiltonian closest to an energy (e.g. the Fermi level)
+
+    Input:
+    ---
+    H: sparse Hermitian matrix (see real_space_hamiltonian)
+    E: target energy
+    k: number of states
+
+    Returns:
+    ---
+    The eigenvalues in ascending order and the eigenvectors as columns
+
+    """
+
+    n = H.shape[0]
+    if k >= n - 1:
+        # Too small for the Lanczos solver
+        evals, evecs = np.linalg.eigh(H.toarray())
+        index = np.sort(np.argsort(np.abs(evals - E))[:k])
+        return evals[index], evecs[:, index]
+
+    # Shift-invert Lanczos; the factorisation fails if E is exactly an eigenvalue, so move off it
+    try:
+        evals, evecs = eigsh(H, k, sigma = E, which = 'LM')
+    except RuntimeError:
+        evals, evecs = eigsh(H, k, sigma = E + 1e-8 * max(1, abs(H).max()), which = 'LM')
+    order = np.argsort(evals)
+    return evals[order], evecs[:, order]
+
+######### Kernel polynomial method #########
+# The DOS is expanded in Chebyshev polynomials of the Hamiltonian rescaled into [-1, 1]. The moments
+# mu_n = Tr T_n(H) / n are estimated from random vectors r as <r|T_n(H)|r>, and the truncated
+# series is damped with a kernel to suppress the Gibbs oscillations.
+
+KPM_MOMENTS = 256 # default number of Chebyshev moments, the energy resolution is ~ bandwidth / moments
+KPM_VECTORS = 16 # default number of random vectors of the stochastic trace
+KPM_BLOCK = 8 # random vectors propagated together as the columns of one dense block
+KPM_MARGIN = 0.01 # fraction of the spectrum width kept free at each end of [-1, 1]
+
+def spectral_bounds(H):
+    # Lower and upper bounds of the spectrum of a sparse Hermitian matrix from the Gershgorin discs
+    H = sparse.csr_matrix(H)
+    d = H.diagonal().real
+    radius = np.asarray(abs(H).sum(1)).ravel() - np.abs(d)
+    return (d - radius).min(), (d + radius).max()
+
+def jackson_kernel(M):
+    # Jackson damping factors g_n, n = 0..M-1
+    n = np.arange(M)
+    q = np.pi / (M + 1)
+    return ((M - n + 1) * np.cos(q * n) + np.sin(q * n) / np.tan(q)) / (M + 1)
+
+def _kpm_moments(H, blocks, M):
+    # Sum over the random-phase vectors r of <r|T_n(H)|r> for a rescaled H, with the doubling relations
+    # mu_2n = 2<a_n|a_n> - mu_0 and mu_2n+1 = 2<a_n+1|a_n> - mu_1 halving the products; blocks is a list of
+    # (number of vectors, random stream), one stream per block so the vectors do not depend on the worker
+    n = H.shape[0]
+    half = (M + 1) // 2
+    mu = np.zeros(2 * half)
+
+    for size, stream in blocks:
+        r = np.exp(2j * np.pi * np.random.default_rng(stream).random((n, size)))
+        a0, a1 = r, H @ r
+        mu0 = np.vdot(a0, a0).real
+        mu1 = np.vdot(a1, a0).real
+        mu[0] += mu0
+        mu[1] += mu1
+        for m in range(1, half):
+            mu[2*m] += 2 * np.vdot(a1, a1).real - mu0
+            a0, a1 = a1, 2 * (H @ a1) - a0
+            mu[2*m + 1] += 2 * np.vdot(a1, a0).real - mu1
+    return mu[:M]
+
+def kpm_dos(H, energies = 512, moments = KPM_MOMENTS, vectors = KPM_VECTORS, kernel = 'jackson',
+            bounds = None, seed = None, processes = 1):
+
+    """
+    Density of states of a large sparse Hamiltonian with the kernel polynomial method
+
+    Input:
+    ---
+    H: sparse Hermitian matrix (e.g. from chain_hamiltonian or real_space_hamiltonian)
+    energies: array of energies, or the number of energies spread over the spectrum
+    moments: number of Chebyshev moments
+    vectors: number of random vectors of the stochastic trace
+    kernel: 'jackson', None (no damping) or an array of moments damping factors
+    bounds: (E_min, E_max) enclosing the spectrum (default: the Gershgorin bounds)
+    seed: seed of the numpy.random.SeedSequence that is split into one stream per block of KPM_BLOCK
+          vectors, so the result does not depend on processes
+    processes: number of worker processes sharing the random vectors
+
+    Returns:
+    ---
+    The energies and the density of states, normalised to the number of states
+    (comparable to np.histogram(eigenvalues, edges)[0] / bin width)
+
+    """
+
+    if isinstance(kernel, str) and kernel != 'jackson':
+        raise ValueError(f"Unknown kernel {kernel!r}, expected 'jackson', None or an array")
+
+    H = sparse.csr_matrix(H)
+    n = H.shape[0]
+    E_min, E_max = spectral_bounds(H) if bounds is None else bounds
+    a = (E_max - E_min) / (2 - 2*KPM_MARGIN) # half width
+    b = (E_max + E_min) / 2 # centre
+    H_scaled = ((H - b * sparse.identity(n, format='csr')) / a).tocsr()
+
+    # Blocks of random vectors, each with its own random stream, shared out between the workers
+    sizes = [min(KPM_BLOCK, vectors - first) for first in range(0, vectors, KPM_BLOCK)]
+    blocks = list(zip(sizes, np.random.SeedSequence(seed).spawn(len(sizes))))
+    if processes == 1:
+        mu = _kpm_moments(H_scaled, blocks, moments)
+    else:
+        parts = np.linspace(0, len(blocks), processes + 1).astype(int)
+        with ProcessPoolExecutor(processes) as pool:
+            mu = sum(pool.map(_kpm_moments, [H_scaled]*processes, [blocks[i:j] for i, j in zip(parts, parts[1:])],
+                              [moments]*processes))
+    mu = mu / (vectors * n)
+
+    if isinstance(kernel, str):
+        g = jackson_kernel(moments)
+    else:
+        g = np.ones(moments) if kernel is None else np.asarray(kernel)
+
+    if np.ndim(energies) == 0:
+        energies = np.linspace(E_min, E_max, energies)
+    energies = np.asarray(energies, dtype=float)
+    x = (energies - b) / a
+    inside = np.abs(x) < 1
+    c = g * mu
+    c[1:] *= 2
+    rho = np.zeros_like(x)
+    rho[inside] = np.polynomial.chebyshev.chebval(x[inside], c) / (np.pi * np.sqrt(1 - x[inside]**2))
+    return energies, n * rho / a